@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+"""
+bench_linegrep -- compare line matching throughput of linegrep with and without the fixed string
+prefilter on test/test.blast repeated to millions of lines.
+
+Usage: python3 bench/bench_linegrep.py [number of lines]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from linegrep import LineMatcher
+
+BLAST = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'test', 'test.blast')
+
+CASES = [
+    ("single", [r"EMORG:(\S+)\s+(\S+)"], None),
+    ("two+opt", [r"^(\S+)\s+EMORG", r"EMORG:(\S+)\s+(\S+)"], [r"(84\.\d+)"]),
+    ("selective", [r"EMORG:(AF3\S*)", r"\s(\d+)\s+\d+$"], [r"(99\.\d+)", r"(\d+\.\d+e-\d+)"]),
+    ("rare", [r"EMORG:(AF0313\S+)\s+(\S+)"], None),
+]
+
+
+def read_lines(count):
+    with open(BLAST) as f_in:
+        lines = f_in.readlines()
+
+    return (lines * (count // len(lines) + 1))[:count]
+
+
+def rate(matcher, lines):
+    t = time.perf_counter()
+
+    for line in lines:
+        matcher.extract(line)
+
+    return len(lines) / (time.perf_counter() - t)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lines = read_lines(count)
+
+    print("Case      \tRegex lines/s\tPrefilter lines/s\tSpeedup")
+
+    for name, pattern, opt_pattern in CASES:
+        plain = LineMatcher(pattern, opt_pattern)
+        plain.literals = []
+        prefilter = LineMatcher(pattern, opt_pattern)
+
+        # Both matchers have to return the same rows
+        assert all(plain.extract(line) == prefilter.extract(line) for line in lines[:10000])
+
+        plain_rate = rate(plain, lines)
+        prefilter_rate = rate(prefilter, lines)
+
+        print("{:<10}\t{:>13.0f}\t{:>17.0f}\t{:>6.2f}x".format(name, plain_rate, prefilter_rate,
+                                                              prefilter_rate / plain_rate))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+"""
+bench_mergegrep -- compare the joins of mergegrep on two random tables of the same size. The old
+join searched every key of table 1 in every row of table 2. The regex join scans table 2 once with
+all keys in a PatternSet and the hash join probes an index with exact keys.
+
+Usage: python3 bench/bench_mergegrep.py [rows per table]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from mergegrep import hash_join, regex_join
+
+
+def make_table(count, rnd, pattern=False):
+    table = []
+
+    for i in range(count):
+        key = "ID{:08d}".format(rnd.randrange(count * 2))
+
+        if pattern:
+            # Prefix search for the keys with the same first 7 digits
+            key = "^" + key[:-1] + r"\d"
+
+        table.append([key, str(rnd.random()), "annotation {}".format(i)])
+
+    return table
+
+
+def loop_join(rows1, rows2, key1, key2):
+    # The former mergegrep: one search in table 2 for every row of table 1
+    for row1 in rows1:
+        pattern = re.compile(row1[key1 - 1])
+
+        for row2 in rows2:
+            if pattern.search(row2[key2 - 1]):
+                yield row1 + row2
+
+
+def run(join, *args):
+    t = time.perf_counter()
+    count = sum(1 for _ in join(*args))
+
+    return count, time.perf_counter() - t
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rnd = random.Random(42)
+    table1 = make_table(count, rnd)
+    patterns = make_table(count, rnd, pattern=True)
+    table2 = make_table(count, rnd)
+
+    print("Keys\tJoin\tRows\tSeconds")
+
+    for keys, name, join, args in [("exact", "loop", loop_join, (table1, table2, 1, 1)),
+                                   ("exact", "regex", regex_join, (table1, table2, 1, 1)),
+                                   ("exact", "hash", hash_join, (table1, table2, 1, 1)),
+                                   ("pattern", "loop", loop_join, (patterns, table2, 1, 1)),
+                                   ("pattern", "regex", regex_join, (patterns, table2, 1, 1))]:
+        rows, seconds = run(join, *args)
+        print("{}\t{}\t{}\t{:.3f}".format(keys, name, rows, seconds))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+"""
+bench_multipattern -- compare header matching throughput of the old per pattern loop in fastagrep
+with the single scan MultiPattern matcher for 10, 1k and 100k patterns.
+
+Usage: python3 bench/bench_multipattern.py [number of headers]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from multipattern import MultiPattern
+
+
+def make_headers(count, rnd):
+    return [">gi|{0}|ref|NP_{1}.1| uncharacterized protein LOC{2} [Mus musculus]".format(
+        rnd.randrange(10 ** 8, 10 ** 9), rnd.randrange(10 ** 5, 10 ** 6), rnd.randrange(10 ** 5, 10 ** 6)).encode()
+        for _ in range(count)]
+
+
+def loop_match(pattern, headers, fixed_strings):
+    hits = 0
+
+    for h in headers:
+        for p in pattern:
+            if fixed_strings:
+                if p.pattern in h:
+                    hits += 1
+                    break
+            elif p.search(h):
+                hits += 1
+                break
+
+    return hits
+
+
+def multi_match(matcher, headers):
+    return sum(1 for h in headers if matcher.search(h))
+
+
+def run(n_patterns, headers, fixed_strings, rnd):
+    pattern = [str(rnd.randrange(10 ** 8, 10 ** 9)).encode() for _ in range(n_patterns)]
+
+    if not fixed_strings:
+        # Mix in some real regular expressions
+        pattern[::10] = [b"NP_" + p[:3] + rb"\d+" for p in pattern[::10]]
+
+    compiled = [re.compile(p) for p in pattern]
+
+    # The old loop gets slow with many patterns so it only sees a part of the headers
+    loop_headers = headers[:max(100, len(headers) * 10 // n_patterns)]
+
+    t = time.perf_counter()
+    loop_match(compiled, loop_headers, fixed_strings)
+    loop_rate = len(loop_headers) / (time.perf_counter() - t)
+
+    t = time.perf_counter()
+    matcher = MultiPattern(pattern, fixed_strings=fixed_strings)
+    build = time.perf_counter() - t
+
+    t = time.perf_counter()
+    multi_match(matcher, headers)
+    multi_rate = len(headers) / (time.perf_counter() - t)
+
+    print("{:>8}\t{:>5}\t{:>12.0f}\t{:>12.0f}\t{:>8.1f}x\t{:>8.3f}".format(
+        n_patterns, "fixed" if fixed_strings else "regex", loop_rate, multi_rate, multi_rate / loop_rate, build))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rnd = random.Random(42)
+    headers = make_headers(count, rnd)
+
+    print("Patterns\tMode \tLoop header/s\tMulti header/s\tSpeedup \tBuild s")
+
+    for fixed_strings in (True, False):
+        for n_patterns in (10, 1000, 100000):
+            run(n_patterns, headers, fixed_strings, rnd)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
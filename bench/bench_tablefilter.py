@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+"""
+bench_tablefilter -- compare the throughput of linegrep --where evaluated row by row and with NumPy
+arrays per batch on test/test.blast repeated to millions of lines.
+
+Usage: python3 bench/bench_tablefilter.py [number of lines]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import tablefilter
+
+from tablefilter import WhereFilter
+
+BLAST = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'test', 'test.blast')
+
+CASES = [
+    ("pident", "pident > 85"),
+    ("pident+evalue", "pident > 85 and evalue < 1e-50"),
+    ("range", "100 < qstart <= 500 or not bitscore > 600"),
+    ("string", "sseqid == 'EMORG:AF031391' and length > 800"),
+]
+
+
+def read_lines(count):
+    with open(BLAST) as f_in:
+        lines = f_in.readlines()
+
+    return (lines * (count // len(lines) + 1))[:count]
+
+
+def rate(where, lines):
+    t = time.perf_counter()
+
+    for _ in where.filter(lines):
+        pass
+
+    return len(lines) / (time.perf_counter() - t)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lines = read_lines(count)
+
+    if tablefilter.numpy is None:
+        print("NumPy is not installed. Only row by row evaluation is available.")
+        return 1
+
+    print("Case          \tRows lines/s\tNumPy lines/s\tSpeedup")
+
+    for name, expression in CASES:
+        rows = WhereFilter(expression)
+        rows._vector_code = None
+        vector = WhereFilter(expression)
+
+        # Both have to select the same lines
+        assert list(rows.filter(lines[:10000])) == list(vector.filter(lines[:10000]))
+
+        rows_rate = rate(rows, lines)
+        vector_rate = rate(vector, lines)
+
+        print("{:<14}\t{:>12.0f}\t{:>13.0f}\t{:>6.2f}x".format(name, rows_rate, vector_rate, vector_rate / rows_rate))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+"""
+bench_writer -- compare the old line by line text output of fastagrep with the block writing
+FastaWriter for many short and few long sequences.
+
+Usage: python3 bench/bench_writer.py [total sequence length in MB]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from fastaio import FastaWriter
+
+
+def make_records(count, length, rnd):
+    seq = bytes(rnd.choice(b"ACGT") for _ in range(length))
+
+    return [(">seq{} random sequence".format(i).encode(), seq) for i in range(count)]
+
+
+def line_write(records, f_out, line_length):
+    # Same as the former output of fastagrep: one str per line from get_line_by_line
+    for header, seq in records:
+        lines = [header.decode()]
+        s = seq.decode()
+        lines.extend(s[i:i + line_length] for i in range(0, len(s), line_length))
+        f_out.write("".join([line + "\n" for line in lines]))
+
+
+def block_write(records, f_out, line_length):
+    with FastaWriter(f_out, line_length) as writer:
+        for header, seq in records:
+            writer.write(header, seq)
+
+
+def run(name, records, line_length):
+    size = sum(len(seq) for _, seq in records)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'out.fa')
+
+        t = time.perf_counter()
+        with open(path, 'w') as f_out:
+            line_write(records, f_out, line_length)
+        line_rate = size / (time.perf_counter() - t) / 1e6
+
+        t = time.perf_counter()
+        block_write(records, open(path, 'wb'), line_length)
+        block_rate = size / (time.perf_counter() - t) / 1e6
+
+    print("{:>10}\t{:>8}\t{:>10.1f}\t{:>10.1f}\t{:>6.1f}x".format(
+        name, len(records), line_rate, block_rate, block_rate / line_rate))
+
+
+def main():
+    total = int(float(sys.argv[1]) * 1e6) if len(sys.argv) > 1 else 200 * 10 ** 6
+    rnd = random.Random(42)
+
+    print("Records   \tCount   \tLine MB/s \tBlock MB/s\tSpeedup")
+
+    run("short", make_records(total // 300, 300, rnd), 60)
+    run("long", make_records(4, total // 4, rnd), 60)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
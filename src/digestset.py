@@ -0,0 +1,143 @@
+# encoding: utf-8
+"""
+digestset -- compact set of fixed width binary digests
+
+Digests of 64 or 128 bit are stored as unsigned 64 bit words in one flat open addressing table, which
+costs 8 or 16 bytes per slot instead of a Python object per entry. If the table outgrows a memory limit
+it is moved to a memory mapped temporary file.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import mmap
+import tempfile
+
+from array import array
+
+__all__ = ['DigestSet']
+
+# Table is grown when this fraction of the slots is used
+MAX_LOAD = 0.7
+
+
+class DigestSet:
+    """Set of binary digests with bits length (64 or 128).
+
+    max_memory limits the table size in bytes kept in memory. Bigger tables are stored in a temporary
+    file in spill_dir (default is the system temp folder).
+    """
+    def __init__(self, bits=128, capacity=1024, max_memory=None, spill_dir=None):
+        if bits not in (64, 128):
+            raise ValueError("Digest size must be 64 or 128 bits not {}".format(bits))
+
+        self.bits = bits
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._width = bits // 64
+        self._size = 0
+        self._capacity = 1
+
+        while self._capacity < capacity:
+            self._capacity *= 2
+
+        self._spill_file = None
+        self._table = self._new_table(self._capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _new_table(self, capacity):
+        nbytes = capacity * self._width * 8
+
+        if self.max_memory is None or nbytes <= self.max_memory:
+            return array('Q', bytes(nbytes))
+
+        spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        spill_file.truncate(nbytes)
+        table = memoryview(mmap.mmap(spill_file.fileno(), nbytes)).cast('Q')
+
+        # Keep the file open as long as the table is used
+        self._spill_file = spill_file
+
+        return table
+
+    def _words(self, digest):
+        words = [int.from_bytes(digest[i:i + 8], 'little') for i in range(0, self._width * 8, 8)]
+
+        # All zero marks an empty slot
+        if not any(words):
+            words[0] = 1
+
+        return words
+
+    def _find(self, table, capacity, words):
+        """Return (slot, found) for words."""
+        width = self._width
+        mask = capacity - 1
+        slot = words[0] & mask
+
+        while True:
+            pos = slot * width
+
+            if width == 1:
+                word = table[pos]
+
+                if word == 0:
+                    return slot, False
+                elif word == words[0]:
+                    return slot, True
+            else:
+                entry = [table[pos + i] for i in range(width)]
+
+                if not any(entry):
+                    return slot, False
+                elif entry == words:
+                    return slot, True
+
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        table = self._new_table(capacity)
+        width = self._width
+        old = self._table
+
+        for pos in range(0, self._capacity * width, width):
+            words = [old[pos + i] for i in range(width)]
+
+            if any(words):
+                slot = self._find(table, capacity, words)[0]
+
+                for i in range(width):
+                    table[slot * width + i] = words[i]
+
+        self._table = table
+        self._capacity = capacity
+
+    def __contains__(self, digest):
+        return self._find(self._table, self._capacity, self._words(digest))[1]
+
+    def add(self, digest):
+        """Add digest (bytes with at least bits / 8 length). Returns False if it was already in the set."""
+        words = self._words(digest)
+        slot, found = self._find(self._table, self._capacity, words)
+
+        if found:
+            return False
+
+        for i in range(self._width):
+            self._table[slot * self._width + i] = words[i]
+
+        self._size += 1
+
+        if self._size > self._capacity * MAX_LOAD:
+            self._grow()
+
+        return True
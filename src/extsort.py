@@ -0,0 +1,206 @@
+# encoding: utf-8
+"""
+extsort -- sort more items than fit into memory
+
+Items are collected until a memory budget is reached, sorted and written as a run to a temporary file.
+The sorted runs are merged with a k-way merge (heapq.merge). Small inputs are sorted in memory without
+temporary files. The sort is stable.
+top_k() selects the first k items (per group) in one pass with bounded heaps.
+
+typed_key() compares numbers numerically and other values as strings, which is needed for columns
+parsed from text like e-values and bitscores.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import heapq
+import pickle
+import sys
+import tempfile
+
+from operator import itemgetter
+
+__all__ = ['external_sort', 'top_k', 'typed_key', 'ReverseKey']
+
+# Default memory budget in bytes
+MAX_MEMORY = 512 * 1024 * 1024
+# Runs are merged into one run if there are more temporary files
+MAX_RUNS = 256
+# Items written with one pickle call
+_BATCH_SIZE = 4096
+# First characters of numbers
+_NUMBER_START = frozenset("0123456789+-.")
+# Only every nth item is measured for the memory estimation
+_SIZE_SAMPLE = 64
+
+
+class ReverseKey:
+    """Wrapper which reverses the order of value. Used for descending string columns."""
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __reduce__(self):
+        return ReverseKey, (self.value, )
+
+
+def typed_key(value, descending=False):
+    """Return a sort key of value. Numbers (also number strings) are sorted numerically and before all
+    other values which are sorted as strings. With descending the order is reversed."""
+    if isinstance(value, (int, float)):
+        number = value
+    elif isinstance(value, str) and value[:1] not in _NUMBER_START:
+        # Skips the slow exception for most strings
+        number = None
+    else:
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+
+    # nan can not be compared
+    if number is not None and number == number:
+        return (1, -number) if descending else (0, number)
+
+    value = str(value)
+
+    return (0, ReverseKey(value)) if descending else (1, value)
+
+
+def _item_size(item):
+    # Rough memory usage of an item, containers are counted with their elements
+    if isinstance(item, (tuple, list)):
+        return sys.getsizeof(item) + sum(sys.getsizeof(i) for i in item)
+
+    return sys.getsizeof(item)
+
+
+def _key_size(key):
+    # Rough memory usage of a stored key and its (key, item) pair. Strings of ReverseKey and small ints
+    # (the flags of typed_key) are shared objects and not counted.
+    size = sys.getsizeof(key) + 64
+
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(part) for part in key if not (type(part) is int and -5 <= part <= 256))
+
+    return size
+
+
+def _write_run(items, spill_dir):
+    run = tempfile.TemporaryFile(dir=spill_dir)
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) == _BATCH_SIZE:
+            pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+            batch = []
+
+    if batch:
+        pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+
+    run.seek(0)
+
+    return run
+
+
+def _read_run(run):
+    try:
+        while True:
+            yield from pickle.load(run)
+    except EOFError:
+        run.close()
+
+
+def external_sort(items, key=None, max_memory=MAX_MEMORY, spill_dir=None, item_size=_item_size):
+    """Yield items sorted by key.
+
+    If the estimated size of the collected items (item_size) and their keys exceeds max_memory bytes
+    they are sorted and written as run to a temporary file in spill_dir (default is the system temp
+    folder).
+    """
+    if key is None:
+        key = _identity
+
+    runs = []
+    buffer = []
+    size = 0
+
+    for n, item in enumerate(items):
+        item_key = key(item)
+        buffer.append((item_key, item))
+
+        if n % _SIZE_SAMPLE == 0:
+            size += (item_size(item) + _key_size(item_key)) * _SIZE_SAMPLE
+
+        if size > max_memory:
+            buffer.sort(key=itemgetter(0))
+            runs.append(_write_run(buffer, spill_dir))
+            buffer = []
+            size = 0
+
+            # Limit the number of open temporary files
+            if len(runs) >= MAX_RUNS:
+                runs = [_write_run(heapq.merge(*[_read_run(run) for run in runs], key=itemgetter(0)), spill_dir)]
+
+    buffer.sort(key=itemgetter(0))
+
+    if not runs:
+        for _, item in buffer:
+            yield item
+        return
+
+    # Runs are in input order and heapq.merge prefers earlier runs for equal keys so the sort is stable
+    for _, item in heapq.merge(*[_read_run(run) for run in runs], buffer, key=itemgetter(0)):
+        yield item
+
+
+def _identity(item):
+    return item
+
+
+def top_k(items, k, key=None, group=None):
+    """Return the first k items by key in sorted order. Ties keep the input order.
+
+    With group (a function returning the group of an item) the first k items of every group are
+    selected. Groups are returned in order of their first item. Memory is bounded by k items per group.
+    """
+    if key is None:
+        key = _identity
+
+    heaps = {}
+
+    if k <= 0:
+        return []
+
+    for n, item in enumerate(items):
+        heap = heaps.setdefault(group(item) if group is not None else None, [])
+        item_key = key(item)
+
+        # Heap top is the item which is dropped first: the biggest key and for equal keys the latest item
+        if len(heap) < k:
+            heapq.heappush(heap, (ReverseKey(item_key), -n, item))
+        elif item_key < heap[0][0].value:
+            heapq.heapreplace(heap, (ReverseKey(item_key), -n, item))
+
+    result = []
+
+    for heap in heaps.values():
+        result.extend(entry[2] for entry in sorted(heap, key=lambda entry: (entry[0].value, -entry[1])))
+
+    return result
@@ -4,6 +4,8 @@ from itertools import product
 import time
 from collections import OrderedDict
 
+from fastaio import read_records
+
 def timing(f):
     def wrap(*args):
         time1 = time.time()
@@ -38,40 +40,10 @@ def create_lib(alphabeth=[b"A", b"C", b"G", b"T", b"W", b"S", b"M", b"K", b"R",
 def create_index(file_name):
     d = OrderedDict()
 
-    h_start = -1
-
     with open(file_name, "rb") as f_in:
-        for line in f_in:
-            if line[0] == 62:
-                if h_start > -1:
-                    new_end = f_in.tell()
-                    new_h_len = len(line)
-
-                    end = new_end - new_h_len
-
-                    # Write out
-                    if line in d:
-                        d[header].append((h_start, h_end, end))
-                    else:
-                        d[header] = [(h_start, h_end, end)]
-
-                    h_start = end
-                    h_end = new_end
-                    header = line[1:].rstrip()
-                else:
-                    h_end = f_in.tell()
-                    h_start = h_end - len(line)
-                    header = line[1:].rstrip()
-
-
-        # Update last end
-        end = f_in.tell()
-
-    # Write out
-    if line in d:
-        d[header].append((h_start, h_end, end))
-    else:
-        d[header] = [(h_start, h_end, end)]
+        # Records are slices of the memory mapped file
+        for record in read_records(f_in):
+            d.setdefault(record.header[1:].rstrip(), []).append((record.offset, record.body_offset, record.end))
 
     return d
 
@@ -21,14 +21,29 @@ It defines classes_and_methods
 import sys
 import os
 import re
+import math
 import time
+import random
 import hashlib
+import multiprocessing
 
 from argparse import ArgumentParser
+from argparse import Namespace
 from argparse import RawDescriptionHelpFormatter
 from argparse import FileType
-
-from BioPylib.BioPylib import (Fasta, MultiFasta,Alphabeth)
+from contextlib import closing, nullcontext
+from itertools import islice
+from operator import attrgetter
+
+from BioPylib.BioPylib import (Fasta, Alphabeth)
+from multipattern import MultiPattern
+from fastaindex import FastaIndex
+from fastaio import detect_compression, open_input, read_records, read_indexed, format_record, FastaWriter
+from fastaregion import parse_region, format_region, read_bed, extract_regions, scan_regions
+from fastamotif import MotifSearch
+from fastastats import composition, format_summary, SequenceStats
+from digestset import DigestSet
+from poolmap import bounded_imap
 
 __all__ = []
 __version__ = '3.4.1'
@@ -39,6 +54,9 @@ DEBUG = 0
 TESTRUN = 0
 PROFILE = 0
 
+# Approximate size of the byte ranges for --jobs
+CHUNK_SIZE = 64 * 1024 * 1024
+
 
 class CLIError(Exception):
     """Generic exception to raise and log different fatal errors."""
@@ -53,12 +71,531 @@ class CLIError(Exception):
         return self.msg
 
 
+class KeyMatcher:
+    """Exact lookup of a key extracted from the header in a set of ids.
+
+    The key is the first capture group of key_pattern or without pattern the first whitespace separated
+    token of the header without the leading '>'. Provides the same search() interface like MultiPattern.
+    """
+    def __init__(self, ids, key_pattern=None):
+        self.ids = set(ids)
+        self._key = re.compile(key_pattern) if key_pattern is not None else None
+
+    def get_key(self, header):
+        if self._key is None:
+            token = header.split(None, 1)
+            return token[0].lstrip(b">") if token else b""
+
+        rematch = self._key.search(header)
+
+        if rematch is None:
+            return None
+        elif rematch.re.groups > 0:
+            return rematch.group(1)
+        else:
+            return rematch.group(0)
+
+    def search(self, header):
+        return self.get_key(header) in self.ids
+
+    def select(self, index, invert=False):
+        """Return the FastaIndex entries in file order whose header matches (or not matches with invert)."""
+        if self._key is None and not invert:
+            # Direct lookup by name instead of checking every header
+            return sorted((entry for key in self.ids for entry in index.get(key)), key=attrgetter('header_offset'))
+
+        return [entry for entry in index if self.search(entry.header) != invert]
+
+
+def open_index(fastafile, args, matcher):
+    """Return the FastaIndex of fastafile if it can be used for the search otherwise None."""
+    name = getattr(fastafile, 'name', None)
+
+    if isinstance(matcher, KeyMatcher) and args.header_pattern.strip() == '^>' and isinstance(name, str) and \
+            os.path.isfile(name):
+        return FastaIndex.open(name, build=args.index)
+
+    return None
+
+
+def select_fasta(fastafile, args, matcher, index=None, end=None):
+    """Yield the records of fastafile whose header matches the pattern (or not with --invert-match).
+
+    Records are FastaRecord objects whose sequence is only read if it is requested. With an index the
+    matching records are sliced from one memory map of the file. Reading stops at byte offset end.
+    """
+    if index is not None:
+        yield from read_indexed(fastafile, matcher.select(index, args.invert_match))
+    else:
+        for record in read_records(fastafile, args.header_pattern.strip(), end=end):
+            # Search for sequences with pattern in header
+            if matcher.search(record.header) != args.invert_match:
+                yield record
+
+
+def _uniform(rnd):
+    """Random number in the open interval (0, 1)."""
+    while True:
+        u = rnd.random()
+
+        if u > 0:
+            return u
+
+
+def _keep(record):
+    # Streamed records lose their sequence with the next record so it is read now
+    if record.body_offset is None:
+        record.sequence()
+
+    return record
+
+
+def reservoir_sample(records, k, rnd):
+    """Return a uniform random sample of k records in input order.
+
+    Uses the reservoir algorithm L which draws random numbers only for the records that enter the
+    reservoir. Records of memory mapped files are kept as offsets, streamed records with their sequence.
+    """
+    records = iter(records)
+    reservoir = [(i, _keep(record)) for i, record in zip(range(k), records)]
+
+    if k > 0 and len(reservoir) == k:
+        w = math.exp(math.log(_uniform(rnd)) / k)
+        i = k - 1
+
+        while True:
+            skip = int(math.log(_uniform(rnd)) / math.log(1 - w))
+            record = next(islice(records, skip, None), None)
+
+            if record is None:
+                break
+
+            i += skip + 1
+            reservoir[rnd.randrange(k)] = (i, _keep(record))
+            w *= math.exp(math.log(_uniform(rnd)) / k)
+
+    return [record for i, record in sorted(reservoir, key=lambda item: item[0])]
+
+
+def sample_records(records, args):
+    """Apply --sample or --fraction to records. Without both records are returned unchanged.
+
+    The random generator starts with --seed for every file, so files with the same number of records
+    (i.e. paired reads) get the same sample positions.
+    """
+    rnd = random.Random(args.seed)
+
+    if args.sample is not None:
+        return reservoir_sample(records, args.sample, rnd)
+    elif args.fraction is not None:
+        return (record for record in records if rnd.random() < args.fraction)
+
+    return records
+
+
+def filter_fasta(fasta, args):
+    """Apply sub sequencing, length filters, cutting and the reverse transcript to fasta.
+
+    Returns None if the sequence is filtered out.
+    """
+    # Create new fasta by sub sequencing
+    if args.start > 0 and args.length > 0:
+        fasta = fasta[args.start:args.start + args.length]
+    elif args.start > 0:
+        fasta = fasta[args.start:]
+    elif args.length > 0:
+        fasta = fasta[:args.length]
+
+    # Filtering too long sequences
+    if args.max_length > 0 and fasta.get_seq_length() > args.max_length:
+        return None
+
+    # Filtering too short sequences
+    if args.min_length > 0 and fasta.get_seq_length() < args.min_length:
+        return None
+
+    # Cutting too long sequences
+    if args.cut_to_size >= 0:
+        fasta = fasta[0:args.cut_to_size]
+
+    # Create the reverse transcript
+    if args.reverse_transcript == "DNA":
+        fasta.set_alphabeth(Alphabeth.DNA)
+        fasta = Fasta(fasta.get_header(), fasta.get_reverse_transcript_sequence())
+    elif args.reverse_transcript == "RNA":
+        fasta.set_alphabeth(Alphabeth.RNA)
+        fasta = Fasta(fasta.get_header(), fasta.get_reverse_transcript_sequence())
+
+    return fasta
+
+
+def format_fasta(fasta, args, counts=None):
+    """Return the output bytes for fasta. Either the fasta record or the summary."""
+    # Create summary instead normal fasta output
+    if args.summary:
+        return b"Header\tSeq.length\tAlphabet\n" + fasta.get_header() + b"\t" + \
+            format_summary(fasta.get_sequence(), counts).encode()
+    elif args.summary_no_header:
+        return fasta.get_header() + b"\t" + format_summary(fasta.get_sequence(), counts).encode()
+    else:
+        return format_record(fasta.get_header(), fasta.get_sequence(), args.line_length)
+
+
+def record_digest(record, args):
+    """Return the hash of the record part selected by --dedupe."""
+    if args.dedupe == 'sequence':
+        data = record.sequence()
+    elif args.dedupe == 'both':
+        data = record.header + b"\n" + record.sequence()
+    else:
+        data = record.header
+
+    return hashlib.blake2b(data, digest_size=args.dedupe_bits // 8).digest()
+
+
+def process_fasta(records, args):
+    """Yield (digest, seq_length, text, counts) for each record.
+
+    digest is the record hash for --rm-duplicates otherwise None. text is None if the sequence was filtered.
+    counts is the composition of the sequence for summaries and --stats otherwise None. Duplicates are
+    removed by the caller because this has to happen in input order over all records.
+    """
+    # Without sub sequencing the length filters are checked before the sequence is read
+    precheck = args.start <= 0 and args.length <= 0 and (args.min_length > 0 or args.max_length > 0)
+    need_counts = args.summary or args.summary_no_header or args.stats is not None
+
+    for record in records:
+        digest = record_digest(record, args) if args.rm_duplicates else None
+
+        if precheck and ((args.max_length > 0 and record.seq_length() > args.max_length) or
+                         (args.min_length > 0 and record.seq_length() < args.min_length)):
+            yield digest, 0, None, None
+            continue
+
+        fasta = filter_fasta(Fasta(record.header, record.sequence()), args)
+
+        if fasta is None:
+            yield digest, 0, None, None
+        else:
+            counts = composition(fasta.get_sequence()) if need_counts else None
+            yield digest, fasta.get_seq_length(), format_fasta(fasta, args, counts), counts
+
+
+def process_regions(fastafile, args, regions):
+    """Yield (digest, seq_length, text, counts) like process_fasta for the regions of fastafile.
+
+    Regular files are read with the index (build if missing) so only the bytes of the regions are read.
+    Streams are scanned and the regions are returned in file order.
+    """
+    need_counts = args.summary or args.summary_no_header or args.stats is not None
+    name = getattr(fastafile, 'name', None)
+
+    def missing(region):
+        sys.stderr.write("Region {} not found in {}.\n".format(format_region(region), name))
+
+    if detect_compression(fastafile) is not None:
+        fastas = scan_regions(open_input(fastafile), regions, args.header_pattern.strip(), missing)
+    elif args.header_pattern.strip() == '^>' and isinstance(name, str) and os.path.isfile(name):
+        fastas = extract_regions(fastafile, FastaIndex.open(name, save=args.index), regions, missing)
+    else:
+        fastas = scan_regions(fastafile, regions, args.header_pattern.strip(), missing)
+
+    for header, seq in fastas:
+        fasta = filter_fasta(Fasta(header, seq), args)
+
+        if fasta is None:
+            yield None, 0, None, None
+        else:
+            counts = composition(fasta.get_sequence()) if need_counts else None
+            yield None, fasta.get_seq_length(), format_fasta(fasta, args, counts), counts
+
+
+def process_file(fastafile, args, matcher, regions=None):
+    """Yield the processed records of fastafile. Large regular files are processed in parallel with --jobs."""
+    if regions is not None:
+        return process_regions(fastafile, args, regions)
+
+    if detect_compression(fastafile) is not None:
+        # Compressed input is read as stream
+        return process_fasta(sample_records(select_fasta(open_input(fastafile), args, matcher), args), args)
+
+    index = open_index(fastafile, args, matcher)
+    name = getattr(fastafile, 'name', None)
+    sampling = args.sample is not None or args.fraction is not None
+
+    if index is None and args.jobs > 1 and not sampling and isinstance(name, str) and os.path.isfile(name):
+        return process_parallel(name, args, matcher)
+
+    return process_fasta(sample_records(select_fasta(fastafile, args, matcher, index), args), args)
+
+
+def select_file(fastafile, args, matcher):
+    """Return the lazy records of fastafile selected by the header filters and sampling."""
+    if detect_compression(fastafile) is not None:
+        records = select_fasta(open_input(fastafile), args, matcher)
+    else:
+        records = select_fasta(fastafile, args, matcher, open_index(fastafile, args, matcher))
+
+    return sample_records(records, args)
+
+
+def count_file(fastafile, args, matcher, duplicates=None):
+    """Return (count, bases, removed) for the matching records of fastafile.
+
+    Only the record boundaries are searched. Sequence lengths are measured without copying the
+    sequence if --count-length or a length filter is set. removed is the number of duplicates found
+    with the DigestSet duplicates.
+    """
+    need_length = args.count_length or args.min_length > 0 or args.max_length > 0
+    count = 0
+    bases = 0
+    removed = 0
+
+    for record in select_file(fastafile, args, matcher):
+        if duplicates is not None and not duplicates.add(record_digest(record, args)):
+            removed += 1
+            continue
+
+        if need_length:
+            length = record.seq_length(keep=False)
+
+            # Filtering too long or too short sequences
+            if (args.max_length > 0 and length > args.max_length) or \
+                    (args.min_length > 0 and length < args.min_length):
+                continue
+
+            bases += length
+
+        count += 1
+
+    return count, bases, removed
+
+
+def search_motifs(fastafile, args, matcher, motifs):
+    """Yield the TSV lines (header, motif, start, end, strand, match) of the MotifSearch motifs in the
+    matching records of fastafile. Positions are 1-based and end is included."""
+    for record in select_file(fastafile, args, matcher):
+        header = record.header[1:]
+
+        for start, end, strand, motif, match in motifs.search(record.chunks()):
+            yield b"\t".join([header, motif, str(start + 1).encode(), str(end).encode(), strand, match]) + b"\n"
+
+
+def chunk_ranges(file_name, chunks, header_pattern):
+    """Split file_name into at most chunks byte ranges. Each range starts at a header line."""
+    size = os.path.getsize(file_name)
+    pattern = re.compile(header_pattern.encode())
+    bounds = [0]
+
+    with open(file_name, 'rb') as f_in:
+        for i in range(1, chunks):
+            pos = size * i // chunks
+
+            if pos <= bounds[-1]:
+                continue
+
+            # Move to the start of the next header line
+            f_in.seek(pos - 1)
+            f_in.readline()
+            pos = f_in.tell()
+
+            for line in f_in:
+                if pattern.search(line):
+                    break
+
+                pos += len(line)
+
+            if pos >= size:
+                break
+
+            if pos > bounds[-1]:
+                bounds.append(pos)
+
+    bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Search state of the worker processes. Set by _init_worker.
+_worker = {}
+
+
+def _init_worker(args, matcher, regions=None):
+    _worker['args'] = args
+    _worker['matcher'] = matcher
+    _worker['regions'] = regions
+
+
+def _worker_args(args):
+    # Open files can not be send to the workers
+    worker_args = Namespace(**{key: value for key, value in vars(args).items()
+                               if key not in ('file', 'output', 'pattern_list', 'id_list', 'region_file', 'stats')})
+    worker_args.stats = True if args.stats is not None else None
+    worker_args.jobs = 1
+
+    return worker_args
+
+
+def _process_range(task):
+    file_name, start, end = task
+    args = _worker['args']
+
+    with open(file_name, 'rb') as f_in:
+        f_in.seek(start)
+
+        return list(process_fasta(select_fasta(f_in, args, _worker['matcher'], end=end), args))
+
+
+def process_parallel(file_name, args, matcher):
+    """Process file_name in byte ranges with --jobs worker processes. Yields the results in input order.
+
+    At most 2 * --jobs ranges are processed ahead of the consumer. Closing the generator stops the workers.
+    """
+    chunks = max(args.jobs * 4, -(-os.path.getsize(file_name) // CHUNK_SIZE))
+    tasks = [(file_name, start, end) for start, end in chunk_ranges(file_name, chunks, args.header_pattern.strip())]
+
+    with multiprocessing.Pool(args.jobs, initializer=_init_worker, initargs=(_worker_args(args), matcher)) as pool:
+        for result in bounded_imap(pool, _process_range, tasks, 2 * args.jobs):
+            yield from result
+
+
+def _process_path(file_name):
+    args = _worker['args']
+
+    with open(file_name, 'rb') as f_in:
+        return list(process_file(f_in, args, _worker['matcher'], _worker['regions']))
+
+
+def _write_path(file_name):
+    args = _worker['args']
+
+    with open(file_name, 'rb') as f_in:
+        return write_file(f_in, args, _worker['matcher'], _worker['regions'])
+
+
+def _is_path(fastafile):
+    name = getattr(fastafile, 'name', None)
+
+    return isinstance(name, str) and os.path.isfile(name)
+
+
+def map_files(func, worker_func, files, args, matcher, regions=None):
+    """Yield func(fastafile, args, matcher, regions) for all files.
+
+    With --jobs and more than one input file whole files are processed by worker_func(file_name) in
+    worker processes. Results are returned in argument order or with --unordered as they complete. At
+    most 2 * --jobs files are processed ahead of the consumer.
+    """
+    if args.jobs <= 1 or len(files) < 2 or not all(_is_path(f) for f in files):
+        for fastafile in files:
+            yield func(fastafile, args, matcher, regions)
+        return
+
+    with multiprocessing.Pool(args.jobs, initializer=_init_worker,
+                              initargs=(_worker_args(args), matcher, regions)) as pool:
+        names = [f.name for f in files]
+        yield from bounded_imap(pool, worker_func, names, 2 * args.jobs, ordered=not args.unordered)
+
+
+def _closing(results):
+    # Results of a file are a list from a worker process or a generator which has to be closed
+    return closing(results) if hasattr(results, 'close') else nullcontext(results)
+
+
+def duplicate_set(args):
+    return DigestSet(args.dedupe_bits, max_memory=args.dedupe_memory * 1024 * 1024, spill_dir=args.dedupe_spill)
+
+
+# File extensions of compressed input which are removed for --output-template
+COMPRESSION_EXTENSIONS = ('.gz', '.bgz', '.bgzf', '.bz2', '.xz', '.zst')
+
+
+def output_name(file_name, template):
+    """Return the output file name of file_name for --output-template.
+
+    Fields are {name} (file name), {dir} (folder of the input), {basename} (file name without extension)
+    and {ext} (extension i.e. '.fa'). Extensions of compressed files are skipped.
+    """
+    folder, name = os.path.split(file_name)
+    basename, ext = os.path.splitext(name)
+
+    if ext in COMPRESSION_EXTENSIONS:
+        basename, ext = os.path.splitext(basename)
+
+    return template.format(name=name, dir=folder or '.', basename=basename, ext=ext)
+
+
+def _same_file(a, b):
+    if os.path.exists(a) and os.path.exists(b):
+        return os.path.samefile(a, b)
+
+    return os.path.realpath(a) == os.path.realpath(b)
+
+
+def check_output_names(file_names, template):
+    """Raise a CLIError if an output file of --output-template is an input file or is used twice."""
+    names = {}
+
+    for file_name in file_names:
+        name = output_name(file_name, template)
+
+        for input_name in file_names:
+            if _same_file(name, input_name):
+                raise CLIError("--output-template {} - Output file {} is the input file {}".format(
+                    template, name, input_name))
+
+        real_name = os.path.realpath(name)
+
+        if real_name in names:
+            raise CLIError("--output-template {} - Output file {} is used for {} and {}".format(
+                template, name, names[real_name], file_name))
+
+        names[real_name] = file_name
+
+
+def write_file(fastafile, args, matcher, regions=None):
+    """Write the results of fastafile to its own file named by --output-template.
+
+    Duplicates are removed within the file. Returns (output name, duplicate count, SequenceStats or None).
+    """
+    name = output_name(fastafile.name, args.output_template)
+    duplicates = duplicate_set(args) if args.rm_duplicates else None
+    stats = SequenceStats() if args.stats is not None else None
+    duplicate_count = 0
+    seq_count = 0
+
+    with FastaWriter(open(name, 'wb'), args.line_length, args.buffer_size * 1024) as f_out, \
+            closing(process_file(fastafile, args, matcher, regions)) as results:
+        for digest, seq_length, text, counts in results:
+            # Remove duplicate sequences with same header
+            if digest is not None and not duplicates.add(digest):
+                duplicate_count += 1
+                continue
+
+            # Sequence was filtered
+            if text is None:
+                continue
+
+            if seq_count == args.max_sequences:
+                break
+
+            f_out.write_raw(text)
+
+            if stats is not None:
+                stats.add(seq_length, counts)
+
+            seq_count += 1
+
+    return name, duplicate_count, stats
+
+
 def start(args):
     pattern = list()
     file_count = 0
     seq_count = 0
     max_seq_length = 0
-    duplicate_header = set()
+    duplicate_count = 0
+    stats = SequenceStats() if args.stats is not None else None
     temp = []
 
     # Extract filename and file extension
@@ -76,142 +613,198 @@ def start(args):
         if not os.path.exists(args.split):
             raise CLIError("-O {} - Path does not exist".format(args.split))
 
+    # Remove duplicates by header, sequence or both. Only --dedupe reports the removed count, plain -d
+    # keeps its silent output.
+    report_duplicates = args.dedupe is not None
+
+    if args.dedupe is not None:
+        args.rm_duplicates = True
+    else:
+        args.dedupe = 'header'
+
+    if args.rm_duplicates:
+        duplicates = duplicate_set(args)
+
     # Set default pattern if pattern was not defined
     if args.pattern is None and args.pattern_list is not None:
         for p in args.pattern_list:
-            pattern.append(re.compile(p.strip()))
-    elif args.pattern is None and args.pattern_list is None:
+            pattern.append(p.strip())
+    elif args.pattern is None and args.pattern_list is None and args.id_list is None:
         args.pattern = b"."
-    else:
+    elif args.pattern is not None:
         args.pattern = args.pattern.encode()
 
     # Get search pattern
     if args.pattern is not None:
-        pattern.append(re.compile(args.pattern.strip()))
+        pattern.append(args.pattern.strip())
+
+    if args.id_list is not None:
+        # Exact id lookup instead of pattern search
+        matcher = KeyMatcher((line.strip() for line in args.id_list if line.strip()),
+                             key_pattern=None if args.key_pattern is None else args.key_pattern.encode())
+    else:
+        # All patterns are searched together in one scan of the header
+        matcher = MultiPattern(pattern, fixed_strings=args.fixed_strings)
+
+    buffer_size = args.buffer_size * 1024
+
+    def open_split(count):
+        return FastaWriter(open(os.path.join(args.split, "".join([args.prefix, str(count), file_extension])), 'wb'),
+                           args.line_length, buffer_size)
+
+    if args.sample is not None and args.sample < 0:
+        raise CLIError("--sample {} - Sample size must not be negative".format(args.sample))
+
+    if args.fraction is not None and not 0 <= args.fraction <= 1:
+        raise CLIError("--fraction {} - Fraction must be between 0 and 1".format(args.fraction))
+
+    # Extract regions instead of searching the headers
+    regions = None
+
+    if args.region is not None:
+        try:
+            regions = [parse_region(region) for region in args.region]
+        except ValueError as e:
+            raise CLIError("-g {}".format(e))
+    elif args.region_file is not None:
+        regions = list(read_bed(args.region_file))
+
+    # Search motifs in the sequences of the matching records
+    if args.motif is not None:
+        try:
+            motifs = MotifSearch([motif.encode() for motif in args.motif], args.strand)
+        except ValueError as e:
+            raise CLIError("-M {}".format(e))
+
+        f_out = FastaWriter(args.output if args.output else sys.stdout)
+
+        for fastafile in ((args.file, ) if args.file is sys.stdin else args.file):
+            for line in search_motifs(fastafile, args, matcher, motifs):
+                f_out.write_raw(line)
+
+        f_out.close()
+
+        return
+
+    # Count matching sequences without output of the sequences
+    if args.count:
+        f_out = FastaWriter(args.output if args.output else sys.stdout)
+        files = (args.file, ) if args.file is sys.stdin else args.file
+        duplicate_count = 0
+
+        for fastafile in files:
+            count, bases, removed = count_file(fastafile, args, matcher, duplicates if args.rm_duplicates else None)
+            duplicate_count += removed
+            line = [str(count)] + ([str(bases)] if args.count_length else [])
+
+            # Like grep -c the file name is added for more than one file
+            if len(files) > 1:
+                line.insert(0, getattr(fastafile, 'name', '-'))
+
+            f_out.write_raw("\t".join(line).encode() + b"\n")
+
+        f_out.close()
+
+        if report_duplicates:
+            sys.stderr.write("Removed {} duplicate sequences.\n".format(duplicate_count))
+
+        return
+
+    # Each input file is written to its own output file
+    if args.output_template is not None:
+        if args.file is sys.stdin or not all(_is_path(f) for f in args.file):
+            raise CLIError("--output-template {} - Input must be files".format(args.output_template))
+
+        # Input files would be truncated before they are read
+        check_output_names([f.name for f in args.file], args.output_template)
+
+        for name, removed, file_stats in map_files(write_file, _write_path, args.file, args, matcher, regions):
+            duplicate_count += removed
+
+            if stats is not None:
+                stats.merge(file_stats)
+
+        if stats is not None:
+            stats.write(args.stats, args.stats_format)
+
+        if report_duplicates:
+            sys.stderr.write("Removed {} duplicate sequences.\n".format(duplicate_count))
+
+        return
 
     # Output to file or stdout or many files
     if args.output:
-        f_out = args.output
+        f_out = FastaWriter(args.output, args.line_length, buffer_size)
     elif args.split is not None:
         f_out = None
     else:
-        f_out = sys.stdout
+        f_out = FastaWriter(sys.stdout, args.line_length, buffer_size)
 
     if DEBUG:
         start = time.time()
 
     # Output to single file no split
     if args.split is not None:
-        f_out = open(os.path.join(args.split, "".join([args.prefix, str(file_count), file_extension])), 'w')
+        f_out = open_split(file_count)
 
     if args.file is sys.stdin:
         args.file = (args.file, )
 
-    # Loop through fasta files
-    for fastafile in args.file:
-        for fasta in MultiFasta.read_fasta(file_obj=fastafile, header_pattern=args.header_pattern.strip()):
-            trig = True
-            h = fasta.get_header()
-            # Search for sequences with pattern in header
-            for p in pattern:
-                if args.fixed_strings:
-                    if p.pattern in h:
-                        trig = False
-                        break
-                else:
-                    if p.search(h):
-                        trig = False
-                        break
-
-            # Invert search result
-            if args.invert_match:
-                trig = not trig
-
-            # If trig false then sequence is in
-            if trig:
-                continue
+    # Loop through fasta files. Generators are closed explicitly to stop the worker processes at -z.
+    with closing(map_files(process_file, _process_path, args.file, args, matcher, regions)) as files:
+        for results in files:
+            with _closing(results):
+                for digest, seq_length, text, counts in results:
+                    # Remove duplicate sequences with same header
+                    if digest is not None and not duplicates.add(digest):
+                        duplicate_count += 1
+                        continue
 
-            # Remove duplicate sequences with same header
-            if args.rm_duplicates:
-                md5 = hashlib.md5()
-                md5.update(fasta.get_header())
-
-                digest = md5.hexdigest()
-                if digest in duplicate_header:
-                    continue
-                else:
-                    duplicate_header.add(digest)
-
-            # Create new fasta by sub sequencing
-            if args.start > 0 and args.length > 0:
-                fasta = fasta[args.start:args.start + args.length]
-            elif args.start > 0:
-                fasta = fasta[args.start:]
-            elif args.length > 0:
-                fasta = fasta[:args.length]
-
-            # Filtering too long sequences
-            if args.max_length > 0 and fasta.get_seq_length() > args.max_length:
-                continue
+                    # Sequence was filtered
+                    if text is None:
+                        continue
 
-            # Filtering too short sequences
-            if args.min_length > 0 and fasta.get_seq_length() < args.min_length:
-                continue
+                    # Write to more files
+                    if args.split is not None:
+                        if args.max_sequences == -1:
+                            args.max_sequences = 1
 
-            # Cutting too long sequences
-            if args.cut_to_size >= 0:
-                fasta = fasta[0:args.cut_to_size]
-
-            # Create the reverse transcript
-            if args.reverse_transcript == "DNA":
-                fasta.set_alphabeth(Alphabeth.DNA)
-                fasta = Fasta(fasta.get_header(), fasta.get_reverse_transcript_sequence())
-            elif args.reverse_transcript == "RNA":
-                fasta.set_alphabeth(Alphabeth.RNA)
-                fasta = Fasta(fasta.get_header(), fasta.get_reverse_transcript_sequence())
-
-            # Write to more files
-            if args.split is not None:
-                if args.max_sequences == -1:
-                    args.max_sequences = 1
-
-                max_seq_length += fasta.get_seq_length()
-                if seq_count >= args.max_sequences or (args.max_seq_length != 0 and max_seq_length >= args.max_seq_length):
-                    f_out.close()
-                    f_out = None
-                    seq_count = 0
-                    max_seq_length = 0
-                    file_count += 1
-
-                if f_out is None:
-                    f_out = open(os.path.join(args.split, "".join([args.prefix, str(file_count), file_extension])), 'w')
-
-                # Create summary instead normal fasta output
-                if args.summary:
-                    f_out.writelines("Header\tSeq.length\tAlphabet\n")
-                    f_out.write(fasta.get_header().decode() + "\t" + fasta.get_summary())
-                elif args.summary_no_header:
-                    f_out.write(fasta.get_header().decode() + "\t" + fasta.get_summary())
-                else:
-                    for line in fasta.get_line_by_line(args.line_length):
-                        f_out.write(line + "\n")
-
-            # Write to one file
-            else:
-                if seq_count == args.max_sequences:
-                    break
+                        max_seq_length += seq_length
+                        if seq_count >= args.max_sequences or (args.max_seq_length != 0 and max_seq_length >= args.max_seq_length):
+                            f_out.close()
+                            f_out = None
+                            seq_count = 0
+                            max_seq_length = 0
+                            file_count += 1
 
-                if args.summary:
-                    f_out.writelines("Header\tSeq.length\tAlphabet\n")
-                    f_out.write(fasta.get_header().decode() + "\t" + fasta.get_summary())
-                elif args.summary_no_header:
-                    f_out.write(fasta.get_header().decode() + "\t" + fasta.get_summary())
-                else:
-                    for line in fasta.get_line_by_line(args.line_length):
-                        f_out.write(line + "\n")
+                        if f_out is None:
+                            f_out = open_split(file_count)
 
-            seq_count += 1
+                        f_out.write_raw(text)
+
+                    # Write to one file
+                    else:
+                        if seq_count == args.max_sequences:
+                            break
+
+                        f_out.write_raw(text)
 
+                    if stats is not None:
+                        stats.add(seq_length, counts)
+
+                    seq_count += 1
+
+            if args.split is None and seq_count == args.max_sequences:
+                break
+
+    if f_out is not None:
+        f_out.close()
+
+    if stats is not None:
+        stats.write(args.stats, args.stats_format)
+
+    if report_duplicates:
+        sys.stderr.write("Removed {} duplicate sequences.\n".format(duplicate_count))
 
     if DEBUG:
         print("\n" + "*" * 60 + "\n" + " " * 25 + "DEBUG MODE:\n")
@@ -254,29 +847,64 @@ USAGE
         group = parser.add_mutually_exclusive_group()
         group2 = parser.add_mutually_exclusive_group()
         group3 = parser.add_mutually_exclusive_group()
+        group4 = parser.add_mutually_exclusive_group()
         parser.add_argument('file', nargs='*', type=FileType('rb'), default=sys.stdin,
-                            help="File from type fasta. Leave empty or use '-' to read from Stdin or pipe.")
+                            help="File from type fasta. Leave empty or use '-' to read from Stdin or pipe. Files compressed with gzip, bgzip, bzip2, xz or zstd are decompressed on the fly.")
         group.add_argument('-e', '--pattern', help='Single regular expression pattern to search for', type=str)
         group.add_argument('-l', '--pattern-list', nargs='?',
                            help='Path to file with multiple patterns. One pattern per line', type=FileType('rb'))
+        group.add_argument('-i', '--id-list', type=FileType('rb'),
+                           help='Path to file with ids. One id per line. Selects sequences whose header key (see --key-pattern) is exactly one of the ids.')
+        group.add_argument('-g', '--region', action='append',
+                           help='Extract the region "name:start-end" (1-based, end included) instead of searching the headers. Add ":-" for the reverse complement. Can be used more than once.')
+        group.add_argument('-G', '--region-file', type=FileType('rb'),
+                           help='Path to BED file with regions to extract (0-based, end excluded, strand in column 6).')
         parser.add_argument('-V', '--version', action='version', version=program_version_message)
         parser.add_argument('-v', '--invert-match', action='store_true',
                             help='Invert the sense of matching, to select non-matching lines.')
         parser.add_argument('-t', '--fixed-strings', action='store_true',
                             help='Interpret PATTERN as a list of fixed strings, separated by newlines, any of which is to be matched.')
+        parser.add_argument('-k', '--key-pattern', type=str,
+                            help='Regular expression with one capture group to extract the key from the header for --id-list i.e. "gi\\|(\\d+)". Default is the first word of the header.')
+        parser.add_argument('-I', '--index', action='store_true',
+                            help='Build the index files <file>.fai and <file>.fah if they are missing or outdated. A valid index is always used to read --id-list matches directly. Regions (-g/-G) build a temporary index in memory without -I.')
         parser.add_argument('-p', '--header-pattern',  default='^>', type=str,
                             help='Use this pattern to identify header line.')
-        #parser.add_argument('-R', '--randomize', action='store_true',
-        #                    help='Randomize order of sequences.')
-        # parser.add_argument('-c', '--count', action='store_true',
-        #                    help='Return the sequence count.')
+        group4.add_argument('--sample', type=int,
+                            help='Return a random sample of this number of matching sequences in input order. Memory is bounded by the sample size.')
+        group4.add_argument('--fraction', type=float,
+                            help='Return each matching sequence with this probability (0-1).')
+        parser.add_argument('--seed', type=int,
+                            help='Seed of the random generator for --sample and --fraction. Files with equal number of sequences get the same sample positions with the same seed.')
+        parser.add_argument('-c', '--count', action='store_true',
+                            help='Return the count of matching sequences instead of the sequences. Only --invert-match, --rm-duplicates, the length filters and sampling are applied.')
+        parser.add_argument('-M', '--motif', action='append',
+                            help='Search the IUPAC motif (i.e. GAATTC or GGNCC) in the sequences of the matching records and return the hits as tab separated header, motif, start, end, strand and matched sequence. Can be used more than once.')
+        parser.add_argument('--strand', choices=['both', '+', '-'], default='both',
+                            help='Strand searched for --motif. Default is both.')
+        parser.add_argument('--count-length', action='store_true',
+                            help='Add the summed sequence length to --count.')
         parser.add_argument('-d', '--rm-duplicates', action='store_true',
                             help='Remove sequences with duplicate header lines. Hold only first founded sequence.')
+        parser.add_argument('--dedupe', choices=['header', 'sequence', 'both'],
+                            help='Part of the record which is compared for duplicate removal. Implies -d and reports the number of removed sequences to stderr. Default is header.')
+        parser.add_argument('--dedupe-bits', choices=[64, 128], default=128, type=int,
+                            help='Size of the hashes stored for duplicate removal. 64 bit hashes need half the memory but can collide on very large inputs. Default is 128.')
+        parser.add_argument('--dedupe-memory', default=1024, type=int,
+                            help='Memory in MB for the duplicate hashes. A bigger hash table is moved to a temporary file. Default is 1024.')
+        parser.add_argument('--dedupe-spill', type=str,
+                            help='Folder for the temporary duplicate hash table. Default is the system temp folder.')
         group2.add_argument('-s', '--summary', action='store_true',
                             help='Returns instead of the normal output only the header and a summary of the sequence.')
         group2.add_argument('-n', '--summary-no-header', action='store_true',
                             help='Same like summary without starting header line.')
-        group3.add_argument('-o', '--output', help='Use output file instead of stdout', type=FileType('w'))
+        parser.add_argument('-S', '--stats', type=FileType('w'),
+                            help="Write statistics over all output sequences (total length, N50/L50, GC and N content, length histogram) to this file. Use '-' for stdout.")
+        parser.add_argument('--stats-format', choices=['tsv', 'json'], default='tsv',
+                            help='Format of --stats. Default is tsv.')
+        group3.add_argument('-o', '--output', help='Use output file instead of stdout', type=FileType('wb'))
+        group3.add_argument('--output-template', type=str,
+                            help='Write each input file to its own output file. Fields are {dir}, {name}, {basename} and {ext} of the input file i.e. "{basename}.filtered{ext}". Duplicates are removed within each file.')
         group3.add_argument('-O', '--split', type=str, default='-', nargs="?",
                             help='Split multi-fasta files in smaller files. Size is 1 by default and is set by -z. Use -r to set name prefix. Default output folder is the current working directory. Add a folder to change directory.')
         parser.add_argument('-r', '--prefix',  default='output', type=str,
@@ -291,11 +919,18 @@ USAGE
                             help='Return the reverse transcript. Sequence must be DNA or RNA. {DNA|RNA}')
         parser.add_argument('-L', '--line-length',  default=60, type=int,
                             help='Max character length of output line. Default is same output as input.')
+        parser.add_argument('--buffer-size', default=1024, type=int,
+                            help='Size of the output blocks in KB. Output is collected until this size is reached and then written at once. Default is 1024.')
         parser.add_argument('-f', '--min-length',  default=0, type=int, help='Filter sequences smaller --min_length.')
         parser.add_argument('-F', '--max-length',  default=0, type=int, help='Filter sequences bigger --max_length.')
         group2.add_argument('-m', '--max-seq-length',  default=0, type=int,
                             help='Create a new file when summary of sequences exceed --max-seq-length. Only used with option -O.')
 
+        parser.add_argument('-j', '--jobs', default=1, type=int,
+                            help='Number of worker processes. More than one input file is processed file by file in parallel, a single regular file is split into ranges of whole records which are searched in parallel. Default is 1.')
+        parser.add_argument('--unordered', action='store_true',
+                            help='Write the results of many input files with --jobs in order of completion instead of argument order.')
+
         # Process arguments
         args = parser.parse_args()
 
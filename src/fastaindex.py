@@ -0,0 +1,154 @@
+# encoding: utf-8
+"""
+fastaindex -- persistent byte offset index for fasta files
+
+The index is stored next to the fasta file in two sidecar files. <file>.fai is compatible with
+samtools faidx (name, length, offset, linebases, linewidth). <file>.fah holds the size and mtime of
+the indexed file followed by the header offset and the full header text of every record. The index
+is rebuild automatically if the size or mtime of the fasta file changed.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import os
+
+from collections import namedtuple
+from collections import defaultdict
+
+from fastaio import read_records
+
+__all__ = ['FastaIndex', 'FastaIndexEntry']
+
+FAI_EXTENSION = '.fai'
+HEADER_EXTENSION = '.fah'
+
+FastaIndexEntry = namedtuple('FastaIndexEntry', ['name', 'length', 'offset', 'linebases', 'linewidth',
+                                                 'header_offset', 'end', 'uniform', 'header'])
+FastaIndexEntry.__doc__ = """Index entry of one fasta record.
+
+offset is the byte offset of the first base, header_offset the offset of the header line and end the
+offset after the last byte of the record. uniform is False if the sequence lines differ in length.
+"""
+
+
+class FastaIndex:
+    """Index of all records of a fasta file. Iterates over the entries in file order."""
+    def __init__(self, file_name, entries, size, mtime):
+        self.file_name = file_name
+        self.entries = entries
+        self.size = size
+        self.mtime = mtime
+        self._names = defaultdict(list)
+
+        for entry in entries:
+            self._names[entry.name].append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def get(self, name):
+        """Return all entries with name. Names are not unique in every fasta file."""
+        return self._names.get(name, [])
+
+    @staticmethod
+    def sidecars(file_name):
+        return file_name + FAI_EXTENSION, file_name + HEADER_EXTENSION
+
+    @classmethod
+    def build(cls, file_name):
+        """Scan the fasta file and create a new index."""
+        entries = []
+        stat = os.stat(file_name)
+
+        with open(file_name, 'rb') as f_in:
+            for record in read_records(f_in):
+                length, linebases, linewidth, uniform = record.layout()
+                name = record.header[1:].split(None, 1)
+
+                entries.append(FastaIndexEntry(name[0] if name else b"", length, record.body_offset, linebases,
+                                               linewidth, record.offset, record.end, uniform, record.header))
+
+        return cls(file_name, entries, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def load(cls, file_name):
+        """Load the index from the sidecar files. Returns None if it is missing or outdated."""
+        fai, fah = cls.sidecars(file_name)
+
+        try:
+            stat = os.stat(file_name)
+
+            with open(fai, 'rb') as f_fai, open(fah, 'rb') as f_fah:
+                meta = f_fah.readline().rstrip(b"\n").split(b"\t")
+
+                if meta[0] != b"#size" or int(meta[1]) != stat.st_size or int(meta[3]) != stat.st_mtime_ns:
+                    return None
+
+                rows = []
+
+                for line_fai, line_fah in zip(f_fai, f_fah):
+                    name, length, offset, linebases, linewidth = line_fai.rstrip(b"\n").split(b"\t")[:5]
+                    header_offset, uniform, header = line_fah.rstrip(b"\n").split(b"\t", 2)
+                    rows.append([name, int(length), int(offset), int(linebases), int(linewidth),
+                                 int(header_offset), uniform == b"1", header])
+        except (OSError, ValueError, IndexError):
+            return None
+
+        entries = []
+
+        for i, row in enumerate(rows):
+            end = rows[i + 1][5] if i + 1 < len(rows) else stat.st_size
+            entries.append(FastaIndexEntry(*row[:6], end, *row[6:]))
+
+        return cls(file_name, entries, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def open(cls, file_name, build=True, save=True):
+        """Load a valid index or build and save a new one. Without build None is returned if no valid
+        index exists. Without save a new index is only kept in memory."""
+        index = cls.load(file_name)
+
+        if index is None and build:
+            index = cls.build(file_name)
+
+            if not save:
+                return index
+
+            try:
+                index.save()
+            except OSError:
+                # Index is still usable for this run i.e. in a read only folder
+                pass
+
+        return index
+
+    def save(self):
+        fai, fah = self.sidecars(self.file_name)
+
+        with open(fai, 'wb') as f_fai, open(fah, 'wb') as f_fah:
+            f_fah.write("#size\t{}\tmtime\t{}\n".format(self.size, self.mtime).encode())
+
+            for e in self.entries:
+                f_fai.write(b"\t".join([e.name] + [str(i).encode() for i in
+                                                   (e.length, e.offset, e.linebases, e.linewidth)]) + b"\n")
+                f_fah.write(b"\t".join([str(e.header_offset).encode(), b"1" if e.uniform else b"0", e.header]) +
+                            b"\n")
+
+    def read_record(self, f_in, entry):
+        """Return the raw bytes of the record including the header line from the seekable file f_in."""
+        f_in.seek(entry.header_offset)
+
+        return f_in.read(entry.end - entry.header_offset)
@@ -0,0 +1,722 @@
+# encoding: utf-8
+"""
+fastaio -- input and output helpers shared by the fasta tools
+
+open_input() detects gzip, BGZF, bzip2, xz and zstd (if the zstandard module is installed) compressed
+input by its magic bytes and decompresses it in a background thread. BGZF blocks are decompressed in
+parallel by a pool of threads.
+
+read_records() iterates over the records of a multi fasta file. Only the header is parsed up front, the
+sequence is read when it is requested. Bodies of skipped records are passed over with fast byte searches.
+Regular files are memory mapped and records are slices of the map, so matching, measuring and indexing
+need no copies of the sequence lines.
+
+FastaWriter writes records to a binary file. Sequences are wrapped by slicing and the output is collected
+into large blocks before it is written.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import io
+import os
+import sys
+import re
+import mmap
+import stat
+import bz2
+import gzip
+import lzma
+import queue
+import struct
+import threading
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ['detect_compression', 'open_input', 'read_records', 'read_indexed', 'FastaRecord', 'format_record',
+           'FastaWriter']
+
+# Size of the decompressed chunks handed over from the background thread
+CHUNK_SIZE = 1024 * 1024
+# Number of chunks the background thread can decompress in advance
+QUEUE_SIZE = 16
+
+# Default size of the output blocks of FastaWriter
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Block size of the record reader
+BLOCK_SIZE = 4 * 1024 * 1024
+
+_WHITESPACE = b" \t\r\n\v\f"
+# Header pattern like '^>' which only need a fixed string at the start of the line
+_LITERAL_HEADER = re.compile(rb"\^([^.^$*+?{}\[\]\\|()]+)")
+
+_MAGIC = [(b"\x1f\x8b", 'gzip'),
+          (b"BZh", 'bz2'),
+          (b"\xfd7zXZ\x00", 'xz'),
+          (b"\x28\xb5\x2f\xfd", 'zstd')]
+
+
+def detect_compression(file_obj):
+    """Return the compression of the binary file_obj ('gzip', 'bgzf', 'bz2', 'xz', 'zstd') or None.
+
+    Nothing is consumed from file_obj. Objects without peek() are reported as not compressed.
+    """
+    if isinstance(file_obj, io.TextIOBase):
+        file_obj = file_obj.buffer
+
+    if not hasattr(file_obj, 'peek'):
+        return None
+
+    magic = file_obj.peek(18)[:18]
+
+    for start, name in _MAGIC:
+        if magic.startswith(start):
+            # BGZF is gzip with an extra field holding the block size
+            if name == 'gzip' and len(magic) >= 14 and magic[3] & 4 and magic[12:14] == b"BC":
+                return 'bgzf'
+
+            return name
+
+    return None
+
+
+def open_input(file_obj, threads=None):
+    """Return a binary file object with the decompressed content of file_obj.
+
+    Uncompressed input is returned unchanged (text streams like sys.stdin are replaced by their binary
+    buffer). Compressed input is decompressed in a background thread. threads sets the number of threads
+    for BGZF input and defaults to the number of cpus.
+    """
+    if isinstance(file_obj, io.TextIOBase):
+        file_obj = file_obj.buffer
+
+    compression = detect_compression(file_obj)
+
+    if compression is None:
+        return file_obj
+    elif compression == 'bgzf':
+        chunks = _bgzf_chunks(file_obj, threads or os.cpu_count() or 1)
+    elif compression == 'gzip':
+        chunks = _stream_chunks(gzip.GzipFile(fileobj=file_obj, mode='rb'))
+    elif compression == 'bz2':
+        chunks = _stream_chunks(bz2.BZ2File(file_obj, mode='rb'))
+    elif compression == 'xz':
+        chunks = _stream_chunks(lzma.LZMAFile(file_obj, mode='rb'))
+    elif zstandard is not None:
+        chunks = _stream_chunks(zstandard.ZstdDecompressor().stream_reader(file_obj))
+    else:
+        raise IOError("{} is zstd compressed. Install the zstandard module to read it.".format(
+            getattr(file_obj, 'name', 'Input')))
+
+    return io.BufferedReader(_ThreadedReader(chunks, getattr(file_obj, 'name', None)), buffer_size=CHUNK_SIZE)
+
+
+def _stream_chunks(stream):
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+
+        if not chunk:
+            break
+
+        yield chunk
+
+
+def _bgzf_blocks(file_obj):
+    """Yield the raw deflate data of all BGZF blocks."""
+    while True:
+        header = file_obj.read(12)
+
+        if len(header) < 12:
+            break
+
+        if header[:2] != b"\x1f\x8b" or not header[3] & 4:
+            raise IOError("Broken BGZF block in {}".format(getattr(file_obj, 'name', 'input')))
+
+        xlen = struct.unpack("<H", header[10:12])[0]
+        extra = file_obj.read(xlen)
+        bsize = None
+        pos = 0
+
+        # Find the BC subfield with the total block size - 1
+        while pos + 4 <= len(extra):
+            slen = struct.unpack("<H", extra[pos + 2:pos + 4])[0]
+
+            if extra[pos:pos + 2] == b"BC":
+                bsize = struct.unpack("<H", extra[pos + 4:pos + 6])[0]
+                break
+
+            pos += 4 + slen
+
+        if bsize is None:
+            raise IOError("Missing BGZF block size in {}".format(getattr(file_obj, 'name', 'input')))
+
+        data = file_obj.read(bsize + 1 - 12 - xlen)
+
+        # Strip CRC32 and ISIZE
+        yield data[:-8]
+
+
+def _bgzf_chunks(file_obj, threads):
+    """Decompress BGZF blocks in a thread pool and yield them in order."""
+    with ThreadPoolExecutor(threads) as pool:
+        pending = deque()
+
+        for block in _bgzf_blocks(file_obj):
+            pending.append(pool.submit(zlib.decompress, block, -15))
+
+            if len(pending) > threads * 4:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ThreadedReader(io.RawIOBase):
+    """Raw stream over chunks which are produced by a background thread."""
+    def __init__(self, chunks, name=None):
+        super().__init__()
+        self.name = name
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._buffer = b""
+        self._pos = 0
+        self._eof = False
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """Put item into the queue. Returns False if the reader was closed in the meantime."""
+        while not self._closing.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _produce(self, chunks):
+        try:
+            for chunk in chunks:
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self._put(e)
+        else:
+            self._put(None)
+        finally:
+            # Shuts down the thread pool of BGZF input
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._buffer):
+            if self._eof:
+                return 0
+
+            chunk = self._queue.get()
+
+            if chunk is None:
+                self._eof = True
+                return 0
+            elif isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+
+            self._buffer = memoryview(chunk)
+            self._pos = 0
+
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+
+        return n
+
+    def close(self):
+        self._closing.set()
+
+        # Pending chunks are dropped. The producer stops at its next put.
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+        super().close()
+
+
+def read_records(file_obj, header_pattern='^>', end=None, mapped=True):
+    """Iterate over the records of the binary multi fasta file_obj as FastaRecord objects.
+
+    A line is a header line if header_pattern is found in it. Reading starts at the current position of
+    file_obj and stops at the byte offset end. Regular files are memory mapped unless mapped is False,
+    streams like stdin or pipes are read in blocks.
+    """
+    if isinstance(file_obj, io.TextIOBase):
+        file_obj = file_obj.buffer
+
+    if isinstance(header_pattern, str):
+        header_pattern = header_pattern.encode()
+
+    literal = _LITERAL_HEADER.fullmatch(header_pattern)
+
+    if literal and mapped and _is_regular(file_obj):
+        try:
+            return iter(_MappedReader(file_obj, literal.group(1), end))
+        except (ValueError, OSError):
+            # i.e. empty files can not be mapped
+            pass
+
+    if end is not None:
+        file_obj = io.BytesIO(file_obj.read(end - file_obj.tell()))
+
+    if literal:
+        return iter(_BlockReader(file_obj, literal.group(1)))
+    else:
+        return iter(_LineReader(file_obj, header_pattern))
+
+
+def read_indexed(file_obj, entries):
+    """Iterate over the records of the regular binary file file_obj at the given FastaIndex entries.
+
+    The file is memory mapped once for all entries and the records are slices of the map.
+    """
+    if isinstance(file_obj, io.TextIOBase):
+        file_obj = file_obj.buffer
+
+    reader = None
+
+    for entry in entries:
+        if reader is None:
+            reader = _MappedReader(file_obj, b">")
+
+        yield reader.record(entry.header_offset, entry.end)
+
+
+def _is_regular(file_obj):
+    try:
+        return stat.S_ISREG(os.fstat(file_obj.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return False
+
+
+def _count_whitespace(buf, start, end):
+    return buf.count(b"\n", start, end) + buf.count(b"\r", start, end) + buf.count(b" ", start, end) + \
+        buf.count(b"\t", start, end)
+
+
+class FastaRecord:
+    """Fasta record with lazy sequence.
+
+    header is the complete header line without line break and offset its byte offset in the input.
+    Records of memory mapped files also know the byte range of their sequence lines (body_offset, end)
+    and stay valid after the next record was fetched. For streamed records the sequence can only be
+    requested before the next record is fetched.
+    """
+    __slots__ = ('header', 'offset', 'body_offset', 'end', '_reader', '_consumed', '_chunks', '_seq', '_length')
+
+    def __init__(self, reader, header, offset, body_offset=None, end=None):
+        self.header = header
+        self.offset = offset
+        self.body_offset = body_offset
+        self.end = end
+        self._reader = reader
+        self._consumed = False
+        self._chunks = None
+        self._seq = None
+        self._length = None
+
+    def _body(self):
+        if self._consumed:
+            raise ValueError("Sequence of {} was already skipped".format(self.header.decode(errors='replace')))
+
+        self._consumed = True
+
+        return self._reader.body()
+
+    def chunks(self):
+        """Yield the raw sequence lines of the record in chunks including the line breaks."""
+        if self.body_offset is not None:
+            for start in range(self.body_offset, self.end, BLOCK_SIZE):
+                yield self._reader.map[start:min(start + BLOCK_SIZE, self.end)]
+        elif self._chunks is not None:
+            yield from self._chunks
+        elif self._seq is not None:
+            yield self._seq
+        else:
+            for buf, start, end in self._body():
+                yield buf[start:end]
+
+    def sequence(self):
+        """Return the sequence without whitespace."""
+        if self._seq is None:
+            if self.body_offset is not None:
+                self._seq = self._reader.map[self.body_offset:self.end].translate(None, _WHITESPACE)
+            else:
+                self._seq = b"".join(self.chunks()).translate(None, _WHITESPACE)
+
+            self._length = len(self._seq)
+            self._chunks = None
+
+        return self._seq
+
+    def seq_length(self, keep=True):
+        """Return the sequence length. Without keep the sequence is only measured and not available
+        afterwards (memory mapped records are always kept)."""
+        if self._length is None:
+            if self.body_offset is not None:
+                self._length = _map_length(self._reader.map, self.body_offset, self.end)
+            elif keep:
+                self._chunks = list(self.chunks())
+                self._length = sum(len(c) - _count_whitespace(c, 0, len(c)) for c in self._chunks)
+            else:
+                self._length = sum(end - start - _count_whitespace(buf, start, end)
+                                   for buf, start, end in self._body())
+
+        return self._length
+
+    def layout(self):
+        """Return (length, linebases, linewidth, uniform) of the sequence lines.
+
+        linebases and linewidth are the bases and bytes of the first line. uniform is False if any line
+        except the last one differs from the first line. For streamed records it has to be called before
+        sequence().
+        """
+        if self.body_offset is not None:
+            return _map_layout(self._reader.map, self.body_offset, self.end)
+
+        if self._chunks is None:
+            if self._seq is not None:
+                raise ValueError("Line layout of a streamed record is not available after sequence()")
+
+            self._chunks = list(self.chunks())
+
+        return _lines_layout(b"".join(self._chunks))
+
+
+# Compiled patterns for the line layout check by (linebases, line break)
+_uniform_patterns = {}
+
+
+def _map_layout(mm, start, end):
+    # Ignore line breaks and empty lines at the end
+    stop = end
+
+    while stop > start and mm[stop - 1] in b"\r\n":
+        stop -= 1
+
+    if stop == start:
+        return 0, 0, 0, True
+
+    eol = mm.find(b"\n", start, end)
+
+    if eol < 0:
+        return stop - start, stop - start, end - start, True
+
+    linewidth = eol + 1 - start
+    linebreak = b"\r\n" if mm[eol - 1] == 13 else b"\n"
+    linebases = linewidth - len(linebreak)
+    pattern = _uniform_patterns.get((linebases, linebreak))
+
+    if pattern is None:
+        pattern = re.compile(rb"(?:\S{%d}%s)*(?:\S{1,%d}(?:%s)?)?[\r\n]*" %
+                             (linebases, linebreak, linebases, linebreak))
+        _uniform_patterns[(linebases, linebreak)] = pattern
+
+    if pattern.fullmatch(mm, start, end):
+        lines, rest = divmod(stop - start, linewidth)
+        return lines * linebases + rest, linebases, linewidth, True
+
+    return _map_length(mm, start, stop), linebases, linewidth, False
+
+
+def _map_length(mm, start, end):
+    # mmap has no count() so the bases are counted in copied blocks
+    length = 0
+
+    for pos in range(start, end, BLOCK_SIZE):
+        block = mm[pos:min(pos + BLOCK_SIZE, end)]
+        length += len(block) - _count_whitespace(block, 0, len(block))
+
+    return length
+
+
+def _lines_layout(body):
+    lines = body.splitlines(keepends=True)
+
+    # Ignore empty lines at the end
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    if not lines:
+        return 0, 0, 0, True
+
+    linebases = len(lines[0].rstrip(b"\r\n"))
+    linewidth = len(lines[0])
+    uniform = all(len(line) == linewidth and len(line.rstrip(b"\r\n")) == linebases for line in lines[:-1]) and \
+        0 < len(lines[-1].rstrip(b"\r\n")) <= linebases
+    length = sum(len(line) - _count_whitespace(line, 0, len(line)) for line in lines)
+
+    return length, linebases, linewidth, uniform
+
+
+class _MappedReader:
+    """Record reader for regular files with fixed header marker. Works on a memory map of the file."""
+    def __init__(self, file_obj, marker, end=None):
+        self.map = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        self._start = file_obj.tell()
+        self._end = len(self.map) if end is None else min(end, len(self.map))
+        self._marker = marker
+        self._sep = b"\n" + marker
+
+    def __iter__(self):
+        mm = self.map
+        size = self._end
+        pos = self._start
+
+        # Skip everything in front of the first header
+        if mm[pos:pos + len(self._marker)] != self._marker:
+            pos = mm.find(self._sep, pos, size)
+
+            if pos < 0:
+                return
+
+            pos += 1
+
+        while pos < size:
+            eol = mm.find(b"\n", pos, size)
+            eol = size if eol < 0 else eol
+            header = mm[pos:eol].rstrip(b"\r")
+
+            # Search starts at the line break of the header to find empty records
+            nxt = mm.find(self._sep, eol, size)
+            end = size if nxt < 0 else nxt + 1
+
+            yield FastaRecord(self, header, pos, min(eol + 1, size), end)
+
+            pos = end
+
+    def record(self, pos, end):
+        """Return the record whose header line starts at pos and whose sequence lines end at end."""
+        eol = self.map.find(b"\n", pos, end)
+        eol = end if eol < 0 else eol
+
+        return FastaRecord(self, self.map[pos:eol].rstrip(b"\r"), pos, min(eol + 1, end), end)
+
+
+class _BlockReader:
+    """Record reader for header lines starting with a fixed marker. Reads the input in large blocks."""
+    def __init__(self, file_obj, marker):
+        self._file = file_obj
+        self._marker = marker
+        self._sep = b"\n" + marker
+        self._buf = b""
+        self._pos = 0
+        self._base = 0
+        self._eof = False
+        self._found = False
+
+    def _fill(self):
+        """Append the next block to the buffer. Returns False at the end of the input."""
+        if self._eof:
+            return False
+
+        block = self._file.read(BLOCK_SIZE)
+
+        if not block:
+            self._eof = True
+            return False
+
+        self._base += self._pos
+        self._buf = self._buf[self._pos:] + block
+        self._pos = 0
+
+        return True
+
+    def body(self):
+        """Yield (buffer, start, end) ranges up to the start of the next header line. Must be called at
+        the start of a line."""
+        self._found = False
+
+        while len(self._buf) - self._pos < len(self._marker) and self._fill():
+            pass
+
+        if self._buf.startswith(self._marker, self._pos):
+            self._found = True
+            return
+
+        while True:
+            idx = self._buf.find(self._sep, self._pos)
+
+            if idx >= 0:
+                yield self._buf, self._pos, idx + 1
+                self._pos = idx + 1
+                self._found = True
+                return
+
+            # The separator could be split at the end of the buffer
+            end = max(self._pos, len(self._buf) - len(self._sep) + 1)
+
+            if end > self._pos:
+                yield self._buf, self._pos, end
+                self._pos = end
+
+            if not self._fill():
+                if len(self._buf) > self._pos:
+                    yield self._buf, self._pos, len(self._buf)
+                    self._pos = len(self._buf)
+
+                return
+
+    def _read_header(self):
+        while True:
+            idx = self._buf.find(b"\n", self._pos)
+
+            if idx >= 0 or not self._fill():
+                break
+
+        offset = self._base + self._pos
+
+        if idx < 0:
+            header = self._buf[self._pos:]
+            self._pos = len(self._buf)
+        else:
+            header = self._buf[self._pos:idx]
+            self._pos = idx + 1
+
+        return header.rstrip(b"\r"), offset
+
+    def __iter__(self):
+        # Skip everything in front of the first header
+        for _ in self.body():
+            pass
+
+        while self._found:
+            record = FastaRecord(self, *self._read_header())
+
+            yield record
+
+            if not record._consumed:
+                record._consumed = True
+
+                for _ in self.body():
+                    pass
+
+
+class _LineReader:
+    """Record reader for any header pattern. Reads the input line by line."""
+    def __init__(self, file_obj, header_pattern):
+        self._lines = iter(file_obj)
+        self._pattern = re.compile(header_pattern)
+        self._line = None
+        self._offset = 0
+
+    def body(self):
+        """Yield (line, 0, len(line)) up to the next header line."""
+        self._line = None
+
+        for line in self._lines:
+            if self._pattern.search(line):
+                self._line = line
+                return
+
+            self._offset += len(line)
+
+            yield line, 0, len(line)
+
+    def __iter__(self):
+        # Skip everything in front of the first header
+        for _ in self.body():
+            pass
+
+        while self._line is not None:
+            record = FastaRecord(self, self._line.rstrip(b"\r\n"), self._offset)
+            self._offset += len(self._line)
+
+            yield record
+
+            if not record._consumed:
+                record._consumed = True
+
+                for _ in self.body():
+                    pass
+
+
+def format_record(header, seq, line_length=60):
+    """Return the fasta record as bytes. seq is wrapped into lines of line_length (no wrapping if <= 0)."""
+    if line_length <= 0 or len(seq) <= line_length:
+        lines = [header, seq] if seq else [header]
+    else:
+        lines = [header]
+        lines.extend([seq[i:i + line_length] for i in range(0, len(seq), line_length)])
+
+    lines.append(b"")
+
+    return b"\n".join(lines)
+
+
+class FastaWriter:
+    """Buffered writer for fasta records and other preformatted output.
+
+    f_out is a binary file (text files like sys.stdout are replaced by their binary buffer). Output is
+    collected until buffer_size bytes are reached and then written with one call.
+    """
+    def __init__(self, f_out, line_length=60, buffer_size=WRITE_BUFFER_SIZE):
+        if isinstance(f_out, io.TextIOBase):
+            f_out.flush()
+            f_out = f_out.buffer
+
+        self.file = f_out
+        self.line_length = line_length
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, header, seq):
+        """Write one fasta record."""
+        self.write_raw(format_record(header, seq, self.line_length))
+
+    def write_raw(self, data):
+        """Write already formatted bytes."""
+        self._buffer.append(data)
+        self._size += len(data)
+
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.file.write(b"".join(self._buffer))
+            self._buffer = []
+            self._size = 0
+
+        self.file.flush()
+
+    def close(self):
+        """Flush and close the underlying file. Standard output is only flushed."""
+        self.flush()
+
+        if self.file not in (getattr(sys.stdout, 'buffer', None), sys.stdout):
+            self.file.close()
@@ -0,0 +1,96 @@
+# encoding: utf-8
+"""
+fastamotif -- search IUPAC sequence motifs on both strands of fasta sequences
+
+Motifs like restriction sites or primers are written with the IUPAC nucleotide codes (N, R, Y, ...)
+and compiled to regular expressions. The minus strand is searched with the reverse complement of the
+motif, so the sequence itself is never reversed. Sequences are searched chunk by chunk with an overlap
+of the longest motif, which finds matches across line breaks and chunk borders without holding the
+whole sequence in memory.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import re
+
+from fastaregion import reverse_complement
+
+__all__ = ['compile_motif', 'MotifSearch']
+
+IUPAC = {b"A": b"A", b"C": b"C", b"G": b"G", b"T": b"[TU]", b"U": b"[TU]",
+         b"R": b"[AG]", b"Y": b"[CTU]", b"S": b"[CG]", b"W": b"[ATU]", b"K": b"[GTU]", b"M": b"[AC]",
+         b"B": b"[CGTU]", b"D": b"[AGTU]", b"H": b"[ACTU]", b"V": b"[ACG]", b"N": b"."}
+
+_WHITESPACE = b" \t\r\n\v\f"
+
+
+def compile_motif(motif):
+    """Return the compiled pattern of the IUPAC motif (bytes). Overlapping matches are found and
+    group 1 is the matched sequence. Case is ignored for soft masked sequences."""
+    try:
+        pattern = b"".join(IUPAC[motif[i:i + 1]] for i in range(len(motif)))
+    except KeyError as e:
+        raise ValueError("Unknown IUPAC code {} in motif {}".format(e.args[0].decode(), motif.decode()))
+
+    return re.compile(b"(?=(" + pattern + b"))", re.IGNORECASE)
+
+
+class MotifSearch:
+    """Search of many motifs on one or both strands (strand is 'both', '+' or '-')."""
+    def __init__(self, motifs, strand='both'):
+        self.patterns = []
+
+        for motif in motifs:
+            motif = motif.strip().upper()
+
+            if not motif:
+                continue
+
+            if strand in ('both', '+'):
+                self.patterns.append((motif, b"+", compile_motif(motif)))
+
+            if strand in ('both', '-'):
+                self.patterns.append((motif, b"-", compile_motif(reverse_complement(motif))))
+
+        self.overlap = max((len(motif) for motif, _, _ in self.patterns), default=1) - 1
+
+    def search(self, chunks):
+        """Yield (start, end, strand, motif, match) for every hit in the sequence given as chunks (i.e.
+        FastaRecord.chunks()). Positions are 0-based on the plus strand, end excluded. match is read on
+        the strand of the hit. Hits are ordered by position within each chunk."""
+        tail = b""
+        # Bases in front of the current buffer
+        offset = 0
+
+        for chunk in chunks:
+            seq = chunk.translate(None, _WHITESPACE)
+
+            if not seq:
+                continue
+
+            buf = tail + seq
+            hits = []
+
+            for motif, strand, pattern in self.patterns:
+                for rematch in pattern.finditer(buf):
+                    start = rematch.start()
+
+                    # Matches inside the overlap were already found in the previous buffer
+                    if start + len(motif) > len(tail):
+                        match = rematch.group(1)
+                        hits.append((offset + start, offset + start + len(motif), strand, motif,
+                                     reverse_complement(match) if strand == b"-" else match))
+
+            hits.sort()
+            yield from hits
+
+            keep = min(len(buf), self.overlap)
+            tail = buf[len(buf) - keep:]
+            offset += len(buf) - keep
@@ -0,0 +1,185 @@
+# encoding: utf-8
+"""
+fastaregion -- extract sub sequences (regions) from fasta files
+
+Regions are given as samtools like strings 'name:start-end' (1-based, end included) with an optional
+strand suffix ':+' or ':-', or as BED file (0-based, end excluded, strand in column 6). With a
+FastaIndex only the bytes of a region are read. The byte offsets are calculated from the line length
+of the record, records with lines of different length are read as a whole.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import re
+
+from collections import namedtuple
+from collections import defaultdict
+
+from fastaio import read_records
+
+__all__ = ['Region', 'parse_region', 'format_region', 'read_bed', 'reverse_complement', 'region_header',
+           'fetch_region', 'extract_regions', 'scan_regions']
+
+Region = namedtuple('Region', ['name', 'start', 'end', 'strand'])
+Region.__doc__ = """Sub sequence of the record name from start to end (0-based, end excluded).
+
+end is None for the rest of the sequence. strand is b"+" or b"-".
+"""
+
+_RANGE = re.compile(rb"^([\d,]+)(?:-([\d,]*))?$")
+_WHITESPACE = b" \t\r\n\v\f"
+_COMPLEMENT = bytes.maketrans(b"ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", b"TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn")
+
+
+def parse_region(text):
+    """Return the Region of the string 'name[:start[-end]][:strand]' with 1-based positions."""
+    if isinstance(text, str):
+        text = text.encode()
+
+    strand = b"+"
+
+    if text[-2:] in (b":+", b":-"):
+        strand = text[-1:]
+        text = text[:-2]
+
+    name, _, positions = text.rpartition(b":")
+    rematch = _RANGE.match(positions)
+
+    # Names can contain ':' themselves
+    if not name or rematch is None:
+        return Region(text, 0, None, strand)
+
+    start = int(rematch.group(1).replace(b",", b""))
+    end = rematch.group(2).replace(b",", b"") if rematch.group(2) else None
+
+    if start < 1 or (end is not None and int(end) < start):
+        raise ValueError("Invalid region {}".format(text.decode()))
+
+    return Region(name, start - 1, int(end) if end is not None else None, strand)
+
+
+def format_region(region):
+    """Return the string 'name:start-end[:-]' of region with 1-based positions like parse_region reads it."""
+    text = region.name.decode(errors='replace')
+
+    if region.start > 0 or region.end is not None:
+        text += ":{}-{}".format(region.start + 1, "" if region.end is None else region.end)
+
+    return text + ":-" if region.strand == b"-" else text
+
+
+def _outside(region, length):
+    # Regions starting behind the end of the record. A whole record is never outside even if it is empty.
+    return region.start >= length and (region.start > 0 or region.end is not None)
+
+
+def read_bed(f_in):
+    """Yield the Regions of a BED file (bytes lines). Header, track and browser lines are skipped."""
+    for line in f_in:
+        if isinstance(line, str):
+            line = line.encode()
+
+        if not line.strip() or line.startswith((b"#", b"track", b"browser")):
+            continue
+
+        cols = line.rstrip(b"\r\n").split(b"\t")
+        strand = cols[5] if len(cols) > 5 and cols[5] in (b"+", b"-") else b"+"
+
+        yield Region(cols[0], int(cols[1]), int(cols[2]), strand)
+
+
+def reverse_complement(seq):
+    """Return the DNA reverse complement of seq (bytes) with IUPAC codes. Used for the minus strand of
+    regions and motifs."""
+    return seq.translate(_COMPLEMENT)[::-1]
+
+
+def region_header(region, length):
+    """Return the samtools like header '>name:start-end' of region. Minus strand regions end with '/rc'."""
+    end = length if region.end is None else min(region.end, length)
+    header = b">" + region.name + ":{}-{}".format(region.start + 1, end).encode()
+
+    return header + b"/rc" if region.strand == b"-" else header
+
+
+def _region_bytes(entry, pos):
+    """Byte offset of sequence position pos in a record with lines of equal length."""
+    return entry.offset + pos // entry.linebases * entry.linewidth + pos % entry.linebases
+
+
+def fetch_region(f_in, entry, region):
+    """Return (header, sequence) of region from the seekable binary file f_in with the FastaIndexEntry
+    of its record."""
+    start = min(region.start, entry.length)
+    end = entry.length if region.end is None else min(region.end, entry.length)
+
+    if entry.uniform and entry.linebases > 0:
+        first = _region_bytes(entry, start)
+        f_in.seek(first)
+        seq = f_in.read(_region_bytes(entry, end) - first).translate(None, _WHITESPACE)
+    else:
+        # Offsets can not be calculated so the whole sequence is read
+        f_in.seek(entry.offset)
+        seq = f_in.read(entry.end - entry.offset).translate(None, _WHITESPACE)[start:end]
+
+    if region.strand == b"-":
+        seq = reverse_complement(seq)
+
+    return region_header(region, entry.length), seq
+
+
+def extract_regions(f_in, index, regions, missing=None):
+    """Yield (header, sequence) for each region in the given order using the FastaIndex of f_in.
+
+    Regions of names which are not in the index or which start behind the end of the record are skipped
+    and passed to missing if set. For names occurring in more than one record the first record is used.
+    """
+    for region in regions:
+        entries = index.get(region.name)
+
+        if not entries or _outside(region, entries[0].length):
+            if missing is not None:
+                missing(region)
+            continue
+
+        yield fetch_region(f_in, entries[0], region)
+
+
+def scan_regions(f_in, regions, header_pattern='^>', missing=None):
+    """Yield (header, sequence) for the regions by reading all records of f_in. Used for streams
+    without index. Regions are returned in file order and in given order within a record. Missing
+    regions are passed to missing like in extract_regions."""
+    by_name = defaultdict(list)
+
+    for region in regions:
+        by_name[region.name].append(region)
+
+    for record in read_records(f_in, header_pattern):
+        name = record.header[1:].split(None, 1)
+        wanted = by_name.pop(name[0] if name else b"", None)
+
+        if wanted is None:
+            continue
+
+        seq = record.sequence()
+
+        for region in wanted:
+            if _outside(region, len(seq)):
+                if missing is not None:
+                    missing(region)
+                continue
+
+            sub = seq[region.start:region.end]
+            yield region_header(region, len(seq)), reverse_complement(sub) if region.strand == b"-" else sub
+
+    if missing is not None:
+        for wanted in by_name.values():
+            for region in wanted:
+                missing(region)
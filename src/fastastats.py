@@ -0,0 +1,151 @@
+# encoding: utf-8
+"""
+fastastats -- sequence composition and file level statistics for fasta files
+
+composition() counts all byte values of a sequence with numpy.bincount if numpy is installed and with
+bytes.count() per occurring symbol otherwise. SequenceStats collects the lengths and compositions of
+many sequences and reports total bases, N50/L50, GC and N content and a length histogram.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import json
+
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['composition', 'format_summary', 'SequenceStats']
+
+# Shorter sequences are faster counted without numpy
+NUMPY_MIN_LENGTH = 4096
+# Symbols are guessed from this number of leading bytes
+_SAMPLE_SIZE = 4096
+
+_GC = b"GCSgcs"
+_ACGTU = b"ACGTUSWacgtusw"
+_N = b"Nn"
+
+
+def composition(seq):
+    """Return a dict with the count of every byte value (int) occurring in seq."""
+    if numpy is not None and len(seq) >= NUMPY_MIN_LENGTH:
+        counts = numpy.bincount(numpy.frombuffer(seq, dtype=numpy.uint8), minlength=256)
+
+        return {int(c): int(counts[c]) for c in numpy.flatnonzero(counts)}
+
+    counts = {}
+
+    while seq:
+        # Count the symbols of a sample and repeat with the bytes which were not counted yet
+        symbols = bytes(set(seq[:_SAMPLE_SIZE]))
+
+        for c in symbols:
+            counts[c] = seq.count(c)
+
+        seq = seq.translate(None, symbols)
+
+    return counts
+
+
+def format_summary(seq, counts=None):
+    """Return the summary line '<length>\\t<symbol>:<count>|...' of seq followed by a line break."""
+    if counts is None:
+        counts = composition(seq)
+
+    return "{}\t{}\n".format(len(seq), "|".join(["{}:{}".format(chr(c), counts[c]) for c in sorted(counts)]))
+
+
+class SequenceStats:
+    """Collects length and composition of sequences for a report over a whole file."""
+    def __init__(self):
+        self.lengths = array('Q')
+        self.counts = {}
+
+    def add(self, length, counts=None):
+        self.lengths.append(length)
+
+        if counts is not None:
+            for c, n in counts.items():
+                self.counts[c] = self.counts.get(c, 0) + n
+
+    def merge(self, other):
+        """Add the sequences of the SequenceStats other."""
+        self.lengths.extend(other.lengths)
+
+        for c, n in other.counts.items():
+            self.counts[c] = self.counts.get(c, 0) + n
+
+    def report(self):
+        """Return the statistics as ordered dict."""
+        lengths = sorted(self.lengths, reverse=True)
+        total = sum(lengths)
+        report = OrderedDict()
+
+        report['sequences'] = len(lengths)
+        report['total_length'] = total
+        report['min_length'] = lengths[-1] if lengths else 0
+        report['max_length'] = lengths[0] if lengths else 0
+        report['mean_length'] = round(total / len(lengths), 2) if lengths else 0
+
+        # N50 is the length of the sequence which reaches half of the total length
+        report['N50'] = 0
+        report['L50'] = 0
+        cumulative = 0
+
+        for i, length in enumerate(lengths, 1):
+            cumulative += length
+
+            if cumulative * 2 >= total:
+                report['N50'] = length
+                report['L50'] = i
+                break
+
+        if self.counts:
+            gc = sum(self.counts.get(c, 0) for c in _GC)
+            acgtu = sum(self.counts.get(c, 0) for c in _ACGTU)
+            n = sum(self.counts.get(c, 0) for c in _N)
+
+            report['GC_percent'] = round(gc * 100 / acgtu, 2) if acgtu else 0
+            report['N_count'] = n
+            report['N_percent'] = round(n * 100 / total, 2) if total else 0
+            report['composition'] = OrderedDict((chr(c), self.counts[c]) for c in sorted(self.counts))
+
+        # Histogram with bins in powers of ten
+        histogram = OrderedDict()
+
+        for length in reversed(lengths):
+            lower = 10 ** (len(str(length)) - 1) if length > 0 else 0
+            key = "{}-{}".format(lower, max(lower * 10 - 1, 0))
+            histogram[key] = histogram.get(key, 0) + 1
+
+        report['length_histogram'] = histogram
+
+        return report
+
+    def write(self, f_out, fmt='tsv'):
+        """Write the report to the text file f_out as 'tsv' or 'json'."""
+        report = self.report()
+
+        if fmt == 'json':
+            json.dump(report, f_out, indent=2)
+            f_out.write("\n")
+            return
+
+        for key, value in report.items():
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    f_out.write("{}.{}\t{}\n".format(key, sub_key, sub_value))
+            else:
+                f_out.write("{}\t{}\n".format(key, value))
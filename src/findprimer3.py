@@ -28,6 +28,7 @@ from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 from argparse import FileType
 from BioHelper import Primer3, Fasta, MultiFasta, Alphabeth
+from fastaio import open_input, read_records
 from Bio import SearchIO
 import glob
 
@@ -87,7 +88,8 @@ def start(args):
     not_unique_primers = MultiFasta()
     unique_primers = MultiFasta()
     fastas = MultiFasta()
-    fastas.load_fasta(file_obj=args.file)
+    for record in read_records(open_input(args.file)):
+        fastas.add_fasta(Fasta(record.header, record.sequence()))
 
     result = None
 
@@ -277,7 +279,7 @@ USAGE
     try:
         # Setup argument parser
         parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
-        parser.add_argument('file', type=FileType('rb'), default='-', help="Fasta file.")
+        parser.add_argument('file', type=FileType('rb'), default='-', help="Fasta file. Can be compressed with gzip, bgzip, bzip2, xz or zstd.")
         parser.add_argument('primer_length', type=int, help='Length of the primer.')
         parser.add_argument('product_size', type=str, help='Product size range [500-2000]. Includes also the primer length')
         parser.add_argument('pls', type=str, help='Path for pls files')
@@ -20,13 +20,23 @@ It defines classes_and_methods
 import sys
 import os
 import re
+import io
+import multiprocessing
 
 from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 from argparse import FileType
 
+from collections import Counter
+from itertools import chain, islice
 from operator import itemgetter
 
+from extsort import external_sort, top_k, typed_key
+from lineindex import LineIndex
+from tablefilter import WhereFilter
+from multipattern import required_literal
+from poolmap import bounded_imap
+
 __all__ = []
 __version__ = 1.4
 __date__ = '2014-06-04'
@@ -36,6 +46,9 @@ DEBUG = 0
 TESTRUN = 0
 PROFILE = 0
 
+# Approximate size of the byte ranges for --jobs
+CHUNK_SIZE = 64 * 1024 * 1024
+
 class CLIError(Exception):
     '''Generic exception to raise and log different fatal errors.'''
     def __init__(self, msg):
@@ -46,125 +59,342 @@ class CLIError(Exception):
     def __unicode__(self):
         return self.msg
 
-def start(args):
-    if(DEBUG):
-        print(args.pattern)
-        
-    #args.file.readline()
-              
-    pattern = []
-    Pattern = [] # Optional patterns
-    
-    for p in args.pattern:
-        pattern.append(re.compile(p))
-    
-    if args.opt_pattern is not None:  
-        for P in args.opt_pattern:
-            Pattern.append(re.compile(P))
+class LineMatcher:
+    '''Extracts the result rows of a line with the grep patterns, optional patterns and split patterns.
 
-    if args.output:
-        f = args.output
-    else:
-        f = sys.stdout
-            
-    i = 1
-    if args.fr:
-        i = args.fr -1
-        for i in range(args.fr - 1):
-            args.file.readline()
-            
-    results = []
+    All patterns are compiled once. Lines without the fixed strings of the grep patterns are rejected
+    with a substring test before any regular expression is run.
+    '''
+    def __init__(self, pattern, opt_pattern=None, split=None):
+        self.pattern = [re.compile(p) for p in pattern]
+        self.opt_pattern = [re.compile(P) for P in opt_pattern] if opt_pattern is not None else []
+
+        # Split patterns are compiled once instead of for every line
+        self.split = (re.compile(split[0]), re.compile(split[1])) if split else None
+
+        # Fixed strings which must be in the line to match all grep patterns
+        self.literals = [lit for lit in (required_literal(p) for p in pattern) if lit]
 
-    for line in args.file:
-        i = i + 1
+        # Lines can not match if a grep pattern has no groups
+        self.never = any(p.groups == 0 for p in self.pattern)
 
-        if args.to is not None and args.to < i:
-            break
+    def _match(self, line):
+        '''Return the groups of all patterns or None if line is unmatched.'''
+        if self.never:
+            return None
+
+        for literal in self.literals:
+            if literal not in line:
+                return None
 
         groups = ()
-        
+
         # Process pattern
-        for p in pattern:
+        for p in self.pattern:
             rematch = p.search(line)
-            
+
+            if rematch:
+                groups = groups + rematch.groups()
+            else:
+                # line is unmatch if not all patterns match
+                return None
+
+        # Process optional pattern
+        for P in self.opt_pattern:
+            rematch = P.search(line)
+
             if rematch:
                 if len(rematch.groups()) == 0:
-                    groups = None
-                    break
-                
+                    groups = groups + ("",)
+
                 groups = groups + rematch.groups()
             else:
-                groups = None
-                break
-            
-        
-        
-        # line is unmatch if not all patterns match
+                groups = groups + ("",)
+
+        return groups
+
+    def extract(self, line):
+        '''Return the list of result rows (tuples) of line or None if line is unmatched.'''
+        groups = self._match(line)
+
         if groups is None:
-            if args.unmatch:
-                args.unmatch[0].write(line)
+            return None
+
+        # Process split
+        if self.split:
+            rematch = self.split[0].search(line)
+
+            if rematch and len(rematch.groups()) > 0:
+                return [groups + (s,) for s in self.split[1].split("".join(rematch.groups()))]
+
+            return []
+
+        return [groups] if len(groups) > 0 else None
+
+
+def read_lines(f, fr=None, to=None):
+    '''Return the lines of f from line --from to line --to (1-based, both included).'''
+    return islice(f, max(fr or 1, 1) - 1, max(to, 0) if to is not None else None)
+
+
+def _is_path(f):
+    name = getattr(f, 'name', None)
+
+    return isinstance(name, str) and os.path.isfile(name)
+
+
+def open_index(args):
+    '''Return the LineIndex of the input file if it is needed for --from/--to or --jobs otherwise None.'''
+    if (args.fr or args.to is not None or args.jobs > 1) and _is_path(args.file):
+        return LineIndex.open(args.file.name, build=args.index)
+
+    return None
+
+
+def select_lines(args, index=None):
+    '''Yield the lines from --from to --to. With an index reading starts at the closest indexed line.'''
+    if index is None or not args.fr:
+        yield from read_lines(args.file, args.fr, args.to)
+        return
+
+    offset, skip = index.seek(args.fr)
+    # Lines in front of offset
+    shift = args.fr - skip - 1
+
+    with open(args.file.name, 'rb') as f_in:
+        f_in.seek(offset)
+        yield from read_lines(io.TextIOWrapper(f_in, encoding=args.file.encoding), skip + 1,
+                              args.to - shift if args.to is not None else None)
+
+
+def read_rows(lines, matcher, unmatch=None, where=None):
+    '''Yield the result rows of all lines. Lines are first filtered by the WhereFilter where. Unmatched
+    lines are written to unmatch.'''
+    if where is not None:
+        lines = where.filter(lines, unmatch)
+
+    for line in lines:
+        rows = matcher.extract(line)
+
+        if rows is None:
+            if unmatch:
+                unmatch.write(line)
             continue
+
+        yield from rows
+
+
+def line_ranges(file_name, chunks):
+    '''Split file_name into at most chunks byte ranges. Each range starts at the beginning of a line.'''
+    size = os.path.getsize(file_name)
+    bounds = [0]
+
+    with open(file_name, 'rb') as f_in:
+        for i in range(1, chunks):
+            pos = size * i // chunks
+
+            if pos <= bounds[-1]:
+                continue
+
+            # Move to the start of the next line
+            f_in.seek(pos - 1)
+            f_in.readline()
+            pos = f_in.tell()
+
+            if pos >= size:
+                break
+
+            if pos > bounds[-1]:
+                bounds.append(pos)
+
+    bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Search state of the worker processes. Set by _init_worker.
+_worker = {}
+
+
+def _init_worker(matcher, where, encoding, group, unmatch):
+    _worker['matcher'] = matcher
+    _worker['where'] = where
+    _worker['encoding'] = encoding
+    _worker['group'] = group
+    _worker['unmatch'] = unmatch
+
+
+def _grep_range(task):
+    file_name, start, end, skip, count = task
+
+    with open(file_name, 'rb') as f_in:
+        f_in.seek(start)
+        data = f_in.read(end - start)
+
+    # Same newline handling and decoding like the file opened by argparse
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding=_worker['encoding'])
+    lines = islice(lines, skip, skip + count if count is not None else None)
+    unmatch = io.StringIO() if _worker['unmatch'] else None
+    rows = read_rows(lines, _worker['matcher'], unmatch, _worker['where'])
+
+    # Groups are counted in the worker and only the partial counts are send back
+    result = Counter(rows) if _worker['group'] else list(rows)
+
+    return result, unmatch.getvalue() if unmatch else ""
+
+
+def grep_parallel(file_name, args, matcher, unmatch=None, index=None, where=None):
+    '''Yield the results of file_name in byte ranges from --jobs worker processes in input order.
+
+    Results are lists of rows or with --group Counters of the rows. Unmatched lines are written to unmatch.
+    With an index the ranges start at indexed lines and only the lines from --from to --to are used.
+    At most 2 * --jobs ranges are processed ahead of the consumer.
+    '''
+    chunks = max(args.jobs * 4, -(-os.path.getsize(file_name) // CHUNK_SIZE))
+
+    if index is not None:
+        tasks = [(file_name, ) + task for task in index.ranges(chunks, args.fr, args.to)]
+    else:
+        tasks = [(file_name, start, end, 0, None) for start, end in line_ranges(file_name, chunks)]
+
+    with multiprocessing.Pool(args.jobs, initializer=_init_worker,
+                              initargs=(matcher, where, args.file.encoding, args.group, unmatch is not None)) as pool:
+        for result, unmatched in bounded_imap(pool, _grep_range, tasks, 2 * args.jobs):
+            if unmatched:
+                unmatch.write(unmatched)
+
+            yield result
+
+
+def _is_parallel(args, index=None):
+    # Without index line numbers of --from and --to are only known by reading from the start
+    if args.jobs <= 1 or (index is None and (args.fr is not None or args.to is not None)):
+        return False
+
+    return _is_path(args.file)
+
+
+def sort_key(sort, columns):
+    '''Return the key function for the -s columns of rows with columns values. First value is the main sorter.
+
+    Numbers are compared numerically and all other values as strings.
+    '''
+    keys = []
+
+    for s in sort:
+        if abs(s) > columns:
+            print("WARNING: -s {0} is ignored. Result has only {1} columns.".format(s,columns), file=sys.stderr)
+        elif abs(s) == 0:
+            print("WARNING: -s {0} is ignored. Columns start with index 1.".format(s,columns), file=sys.stderr)
         else:
-            # Process optional pattern
-            for P in Pattern:
-                rematch = P.search(line)
-            
-                if rematch:
-                    if len(rematch.groups()) == 0:
-                        groups = groups + ("",)
-                                    
-                    groups = groups + rematch.groups()
-                else:
-                    groups = groups + ("",)
-                        
-            
-        # Process split
-        splitres = None
-        if args.split:
-            split1 = re.compile(args.split[0])
-            split2 = re.compile(args.split[1])
-            rematch = split1.search(line)
-                        
-            if rematch:
-                if len(rematch.groups()) > 0:
-                    splitres = split2.split("".join(list(rematch.groups())))
+            keys.append((abs(s) - 1, s < 0))
+
+    # Flat tuples are compared faster than nested ones
+    def key(row):
+        k = ()
+        for i, descending in keys:
+            k += typed_key(row[i], descending)
+        return k
+
+    return key
+
+
+def sort_rows(rows, args):
+    '''Yield rows sorted by the -s columns. Rows which exceed --sort-memory are sorted in temporary runs
+    and merged.'''
+    rows = iter(rows)
+    first = next(rows, None)
+
+    if first is None:
+        return
+
+    yield from external_sort(chain((first, ), rows), key=sort_key(args.sort, len(first)),
+                             max_memory=args.sort_memory * 1024 * 1024, spill_dir=args.temp_dir)
 
-            if splitres is not None:
-                for s in splitres:
-                    results.append(groups + (s,))
+
+def top_rows(rows, args):
+    '''Return the first --top rows by the -s columns (per --top-by column) without sorting all rows.'''
+    rows = iter(rows)
+    first = next(rows, None)
+
+    if first is None:
+        return []
+
+    group = None
+
+    if args.top_by is not None:
+        if not 0 < args.top_by <= len(first):
+            raise CLIError("--top-by {0} - Result has only {1} columns.".format(args.top_by, len(first)))
+
+        group = itemgetter(args.top_by - 1)
+
+    # Without -s all rows are equal and the first rows are kept
+    key = sort_key(args.sort, len(first)) if args.sort is not None else lambda row: ()
+
+    return top_k(chain((first, ), rows), args.top, key=key, group=group)
+
+
+def start(args):
+    if(DEBUG):
+        print(args.pattern)
+
+    where = None
+
+    if args.where is not None:
+        try:
+            where = WhereFilter(args.where, args.where_delimiter)
+        except ValueError as e:
+            raise CLIError("--where {}".format(e))
+
+    # Without pattern --where returns the selected lines
+    pattern = args.pattern if args.pattern is not None else ['(.*)'] if where is not None else ['.*']
+    matcher = LineMatcher(pattern, args.opt_pattern, args.split)
+
+    if args.output:
+        f = args.output
+    else:
+        f = sys.stdout
+
+    unmatch = args.unmatch[0] if args.unmatch else None
+    index = open_index(args)
+
+    if _is_parallel(args, index):
+        results = grep_parallel(args.file.name, args, matcher, unmatch, index, where)
+
+        if args.group:
+            # Partial counts are merged in input order which keeps the order of the first occurrence
+            counts = Counter()
+            for result in results:
+                counts.update(result)
         else:
-            if len(groups) > 0:
-                results.append(groups)
-            else:  
-                if args.unmatch:
-                    args.unmatch[0].write(line) 
-                  
-    if len(results) > 0:            
-        # Group and Count
+            rows = chain.from_iterable(results)
+    else:
+        rows = read_rows(select_lines(args, index), matcher, unmatch, where)
+
+        # Group and Count in one pass. Memory is bounded by the number of groups.
         if args.group:
-            results = [l + (results.count(l),) for l in set(results)]
-            
-        # Sort
-        if args.sort is not None:
-            # First -s value is the main sorter therefore the last sort
-            results.reverse()
-            
-            for s in args.sort:
-                if abs(s) > len(results[0]):
-                    print("WARNING: -s {0} is ignored. Result has only {1} columns.".format(s,len(results[0])), file=sys.stderr)
-                elif abs(s) == 0:
-                    print("WARNING: -s {0} is ignored. Columns start with index 1.".format(s,len(results[0])), file=sys.stderr)
-                else:
-                    results = sorted(results, key=itemgetter(abs(s)-1),reverse=s<0)
+            counts = Counter(rows)
+
+    if args.group:
+        rows = [row + (count,) for row, count in counts.items()]
+
+    # Sorting needs all results otherwise they are written as they are found
+    if args.top is not None:
+        rows = top_rows(rows, args)
+    elif args.sort is not None:
+        rows = sort_rows(rows, args)
 
+    written = False
+
+    for row in rows:
         # Add Header
-        if args.header:
+        if not written and args.header:
             f.write(args.header + '\n')
-            
-        # Write results        
-        for line in results:
-            f.write(args.delimiter.join(map(str,line)) + '\n')
 
+        written = True
+        f.write(args.delimiter.join(map(str,row)) + '\n')
+
+    if written:
         f.close()
 
 def main(argv=None): # IGNORE:C0111
@@ -200,21 +430,34 @@ USAGE
         #parser.add_argument("-v", "--verbose", dest="verbose", action="count", help="set verbosity level [default: %(default)s]")        
         parser.add_argument('-V', '--version', action='version', version=program_version_message)    
         parser.add_argument('-H', '--header', nargs='?', help="Add header line to output. To add tabs use Ctrl+v+tab in the bash.",type=str)
-        parser.add_argument('-p', '--pattern', nargs='+', help="Grep pattern.",type=str, default=['.*'])
+        parser.add_argument('-p', '--pattern', nargs='+', help="Grep pattern.",type=str)
         parser.add_argument('-P', '--opt-pattern', nargs='*', help="Optional grep pattern. Count line also if pattern is not found.",type=str)
         parser.add_argument('-r', '--split', nargs=2, help="Split pattern. First pattern for sequence to split. Second pattern for split.",type=str)
         parser.add_argument('file', nargs='?', type=FileType('r'), default='-', help="File to grep. Leave empty or use '-' to read from Stdin.")
         parser.add_argument('-d', '--delimiter', help='Set the delimiter for the output',type=str, default='\t')
         parser.add_argument('-f', '--from', dest='fr', help='Skip N-1 lines from begin of file. Use also the --to option to limit input',type=int)
         parser.add_argument('-t', '--to', help='Read only to this line. All other lines are skipped.',type=int)
+        parser.add_argument('-w', '--where', help='Select only lines whose columns match the expression i.e. "pident > 85 and evalue < 1e-50". Columns are c1, c2, ... or the BLAST -outfmt 6 names qseqid, sseqid, pident, length, mismatch, gapopen, qstart, qend, sstart, send, evalue, bitscore. Numbers are compared numerically. Without -p the selected lines are returned.',type=str)
+        parser.add_argument('--where-delimiter', help='Column delimiter of the input lines for --where. Default is any whitespace.',type=str)
         parser.add_argument('-o', '--output', help='Use output file instead of stdout',type=FileType('w'))
         parser.add_argument('-g', '--group', help='Instead of normal input identical lines are grouped together and an additional column is added with the group count.', action='store_true')    
-        parser.add_argument('-s', '--sort', nargs='+', help='Set columns for sorting. Use + or - to set descending or ascending order i.e -s -2 3 for sorting column 2 in descending order and than column 3 in ascending order.',type=int)
+        parser.add_argument('-s', '--sort', nargs='+', help='Set columns for sorting. Use + or - to set descending or ascending order i.e -s -2 3 for sorting column 2 in descending order and than column 3 in ascending order. Numbers are sorted numerically.',type=int)
+        parser.add_argument('--top', help='Return only the first K results in order of -s without sorting all results. Without -s the first K results are returned.',type=int)
+        parser.add_argument('--top-by', help='Return the first --top results for each value of this column i.e. the best hits per query.',type=int)
+        parser.add_argument('--sort-memory', help='Memory in MB used for sorting. More results are sorted in temporary files. Default is 512.',type=int, default=512)
+        parser.add_argument('--temp-dir', help='Folder for temporary sort files. Default is the system temp folder.',type=str)
+        parser.add_argument('-j', '--jobs', default=1, type=int,
+                            help='Number of worker processes. Large input files are split into line aligned byte ranges which are processed in parallel. Results keep the input order. Not used with Stdin and with --from/--to only if there is a line index (see --index). Default is 1.')
+        parser.add_argument('-I', '--index', action='store_true',
+                            help='Build the line index <file>.lix if it is missing or outdated. A valid index is always used to start reading at --from and to split the input for --jobs.')
         parser.add_argument('-u', '--unmatch', nargs=1, type=FileType('w'), help="Write unmatched lines into file.")
 
         # Process arguments
         args = parser.parse_args()
 
+        if args.top_by is not None and args.top is None:
+            parser.error("--top-by needs --top")
+
         if DEBUG:
             print(args)
 
@@ -0,0 +1,166 @@
+# encoding: utf-8
+"""
+lineindex -- persistent sparse line offset index for large text files
+
+The byte offset of every step-th line is stored next to the file in <file>.lix. Line N is reached by
+seeking to the closest indexed line before it and reading at most step - 1 lines. The first line of
+the sidecar holds the size and mtime of the indexed file and the index is rebuild automatically if they
+changed. Lines are counted by their newline character.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import os
+
+from itertools import accumulate
+
+__all__ = ['LineIndex']
+
+LINE_INDEX_EXTENSION = '.lix'
+# Every step-th line is indexed
+INDEX_STEP = 4096
+# Bytes read at once while building the index
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class LineIndex:
+    """Byte offsets of the lines 1, step + 1, 2 * step + 1, ... of a file."""
+    def __init__(self, file_name, offsets, lines, step, size, mtime):
+        self.file_name = file_name
+        self.offsets = offsets
+        self.lines = lines
+        self.step = step
+        self.size = size
+        self.mtime = mtime
+
+    def __len__(self):
+        return self.lines
+
+    @staticmethod
+    def sidecar(file_name):
+        return file_name + LINE_INDEX_EXTENSION
+
+    @classmethod
+    def build(cls, file_name, step=INDEX_STEP):
+        """Scan the file and create a new index."""
+        stat = os.stat(file_name)
+        offsets = [0]
+        # Complete lines before pos
+        lines = 0
+        pos = 0
+        last = b"\n"
+
+        with open(file_name, 'rb') as f_in:
+            while True:
+                block = f_in.read(_BLOCK_SIZE)
+
+                if not block:
+                    break
+
+                # ends[i] + i + 1 is the start of the line after the i-th newline of block
+                ends = list(accumulate(map(len, block.split(b"\n"))))
+                newlines = len(ends) - 1
+
+                for i in range((-lines - 1) % step, newlines, step):
+                    offsets.append(pos + ends[i] + i + 1)
+
+                lines += newlines
+                pos += len(block)
+                last = block[-1:]
+
+        # Last line without newline
+        if last != b"\n":
+            lines += 1
+
+        # No line starts at the end of the file
+        if offsets[-1] >= stat.st_size:
+            offsets.pop()
+
+        return cls(file_name, offsets, lines, step, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def load(cls, file_name):
+        """Load the index from the sidecar file. Returns None if it is missing or outdated."""
+        try:
+            stat = os.stat(file_name)
+
+            with open(cls.sidecar(file_name), 'rb') as f_lix:
+                meta = f_lix.readline().rstrip(b"\n").split(b"\t")
+
+                if meta[0] != b"#size" or int(meta[1]) != stat.st_size or int(meta[3]) != stat.st_mtime_ns:
+                    return None
+
+                step = int(meta[5])
+                lines = int(meta[7])
+                offsets = [int(line) for line in f_lix]
+        except (OSError, ValueError, IndexError):
+            return None
+
+        return cls(file_name, offsets, lines, step, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def open(cls, file_name, build=True):
+        """Load a valid index or build and save a new one. Without build None is returned if no valid
+        index exists."""
+        index = cls.load(file_name)
+
+        if index is None and build:
+            index = cls.build(file_name)
+
+            try:
+                index.save()
+            except OSError:
+                # Index is still usable for this run i.e. in a read only folder
+                pass
+
+        return index
+
+    def save(self):
+        with open(self.sidecar(self.file_name), 'wb') as f_lix:
+            f_lix.write("#size\t{}\tmtime\t{}\tstep\t{}\tlines\t{}\n".format(self.size, self.mtime, self.step,
+                                                                         self.lines).encode())
+            f_lix.write(b"".join(str(offset).encode() + b"\n" for offset in self.offsets))
+
+    def seek(self, line):
+        """Return (offset, skip): the byte offset of an indexed line and the number of lines to skip
+        after it to reach line (1-based)."""
+        k = min(max(line - 1, 0) // self.step, len(self.offsets) - 1) if self.offsets else 0
+
+        return (self.offsets[k] if self.offsets else 0), max(line - 1, 0) - k * self.step
+
+    def ranges(self, chunks, fr=None, to=None):
+        """Split the lines fr to to (1-based, both included) into at most chunks line aligned ranges.
+
+        Returns a list of (start, end, skip, count). Line number k * step + 1 starts at byte start and
+        the range ends at byte end. The first skip lines of a range are not in the selection and count
+        is the number of selected lines.
+        """
+        fr = max(fr or 1, 1)
+        to = min(to if to is not None else self.lines, self.lines)
+
+        if fr > to or not self.offsets:
+            return []
+
+        first = (fr - 1) // self.step
+        last = min((to - 1) // self.step + 1, len(self.offsets))
+        entries = last - first
+        chunks = max(1, min(chunks, entries))
+        bounds = [first + entries * i // chunks for i in range(chunks + 1)]
+        result = []
+
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            start_line = max(fr, a * self.step + 1)
+            end_line = min(to, b * self.step)
+
+            if end_line >= start_line:
+                result.append((self.offsets[a], self.offsets[b] if b < len(self.offsets) else self.size,
+                               start_line - a * self.step - 1, end_line - start_line + 1))
+
+        return result
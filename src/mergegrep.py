@@ -4,6 +4,14 @@
 mergegrep -- merge tables by joining tables over keys by a grep search
 in a second table
 
+By default rows are joined if their keys are equal. Table 2 is read once into a hash index on its key
+column which is probed with the keys of table 1 (inner, left or anti join). With --regex the keys of
+table 1 are regular expressions which are searched in the key column of table 2. With --sort-merge
+both tables are sorted by their keys in temporary files (extsort) and joined in one streaming pass, so
+neither table has to fit into memory.
+
+Tables are read with the csv module, so quoted cells may contain the delimiter.
+
 @author:     Norbert Auer
 
 @copyright:  ACIB GmbH. All rights reserved.
@@ -16,12 +24,18 @@ in a second table
 
 import sys
 import os
-import re
+import csv
+
+from itertools import groupby
+from operator import itemgetter
 
 from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 from argparse import FileType
 
+from extsort import external_sort
+from multipattern import PatternSet
+
 __all__ = []
 __version__ = '0.1'
 __date__ = '2016-04-11'
@@ -31,6 +45,8 @@ DEBUG = 0
 TESTRUN = 0
 PROFILE = 0
 
+JOIN_TYPES = ['inner', 'left', 'anti']
+
 
 class CLIError(Exception):
     """Generic exception to raise and log different fatal errors."""
@@ -45,6 +61,148 @@ class CLIError(Exception):
         return self.msg
 
 
+def read_table(f_in, delimiter, quote):
+    """Yield the rows of f_in. Cells are split by delimiter and quoted cells can contain the delimiter.
+    Empty lines are skipped."""
+    if len(delimiter) != 1 or len(quote) > 1:
+        # The csv module needs single characters
+        rows = ([item.strip(quote) for item in line.strip().split(delimiter)] for line in f_in)
+    elif quote:
+        rows = csv.reader(f_in, delimiter=delimiter, quotechar=quote)
+    else:
+        rows = csv.reader(f_in, delimiter=delimiter, quoting=csv.QUOTE_NONE)
+
+    for row in rows:
+        if "".join(row).strip():
+            yield row
+
+
+def row_writer(f_out, delimiter, quote=None):
+    """Return a function which writes a row to f_out. With quote all cells are quoted otherwise only
+    cells with delimiter, quotes or line breaks."""
+    if len(delimiter) != 1 or (quote is not None and len(quote) != 1):
+        if quote is None:
+            return lambda row: f_out.write(delimiter.join(row) + "\n")
+
+        return lambda row: f_out.write(delimiter.join([quote + item + quote for item in row]) + "\n")
+
+    if quote is None:
+        writer = csv.writer(f_out, delimiter=delimiter, lineterminator="\n")
+    else:
+        writer = csv.writer(f_out, delimiter=delimiter, quotechar=quote, quoting=csv.QUOTE_ALL, lineterminator="\n")
+
+    return writer.writerow
+
+
+def _join(row1, matches, width2, join):
+    # Result rows of row1 and its matching rows of table 2
+    if join == 'anti':
+        if not matches:
+            yield row1
+    elif matches:
+        for row2 in matches:
+            yield row1 + row2
+    elif join == 'left':
+        yield row1 + [""] * width2
+
+
+def hash_join(rows1, rows2, key1, key2, join='inner'):
+    """Yield the joined rows of rows1 and rows2 whose cells key1 and key2 (1-based) are equal.
+
+    rows2 is held in a hash index and rows1 is streamed. inner returns row1 + row2 of all matches,
+    left also returns unmatched rows1 with empty cells and anti only the unmatched rows1.
+    """
+    index = {}
+    width2 = 0
+
+    for row2 in rows2:
+        width2 = max(width2, len(row2))
+
+        if len(row2) >= key2:
+            index.setdefault(row2[key2 - 1], []).append(row2)
+
+    for row1 in rows1:
+        yield from _join(row1, index.get(row1[key1 - 1]) if len(row1) >= key1 else None, width2, join)
+
+
+def regex_join(rows1, rows2, key1, key2, join='inner', quote=None):
+    """Yield the joined rows of rows1 and rows2 where the pattern in cell key1 is found in cell key2.
+
+    Same join types like hash_join. quote is removed from the cells key2 before the search. All
+    patterns of rows1 are compiled into one PatternSet and rows2 is scanned once. Every cell reports
+    all its matching patterns.
+    """
+    rows1 = list(rows1)
+    keyed = [i for i, row1 in enumerate(rows1) if len(row1) >= key1]
+    patterns = PatternSet([rows1[i][key1 - 1] for i in keyed])
+    matches = [[] for _ in rows1]
+    width2 = 0
+
+    for row2 in rows2:
+        width2 = max(width2, len(row2))
+
+        if len(row2) < key2:
+            continue
+
+        for i in patterns.matches(row2[key2 - 1].strip(quote)):
+            matches[keyed[i]].append(row2)
+
+    for row1, row_matches in zip(rows1, matches):
+        yield from _join(row1, row_matches, width2, join)
+
+
+def _sort_key(row, key):
+    # Rows without key column are sorted first and never match
+    return (1, row[key - 1]) if len(row) >= key else (0, "")
+
+
+def _row_size(item):
+    # Memory of a (key, row) item of the external sort. The key is counted by external_sort.
+    row = item[1]
+
+    return sys.getsizeof(item) + sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row)
+
+
+def sort_merge_join(rows1, rows2, key1, key2, join='inner', max_memory=512 * 1024 * 1024, spill_dir=None):
+    """Yield the joined rows of rows1 and rows2 whose cells key1 and key2 (1-based) are equal in key order.
+
+    Both tables are sorted by their keys with external_sort. Runs which exceed max_memory bytes are
+    written to temporary files in spill_dir. Only the rows2 of one key are held in memory. Same join
+    types like hash_join. Rows with equal keys keep their input order.
+    """
+    width = [0]
+
+    def keyed(rows, key, measure=False):
+        for row in rows:
+            if measure:
+                width[0] = max(width[0], len(row))
+
+            yield _sort_key(row, key), row
+
+    sorted1 = external_sort(keyed(rows1, key1), key=itemgetter(0), max_memory=max_memory // 2,
+                            spill_dir=spill_dir, item_size=_row_size)
+    sorted2 = external_sort(keyed(rows2, key2, measure=True), key=itemgetter(0), max_memory=max_memory // 2,
+                            spill_dir=spill_dir, item_size=_row_size)
+    groups2 = groupby(sorted2, key=itemgetter(0))
+    # The first group is read after rows2 is sorted so the width of table 2 is known
+    group2 = next(groups2, None)
+
+    for k1, group1 in groupby(sorted1, key=itemgetter(0)):
+        while group2 is not None and group2[0] < k1:
+            group2 = next(groups2, None)
+
+        matches = None
+
+        if k1[0] and group2 is not None and group2[0] == k1:
+            if not isinstance(group2[1], list):
+                group2 = (group2[0], [row2 for _, row2 in group2[1]])
+
+            matches = group2[1]
+
+        for _, row1 in group1:
+            yield from _join(row1, matches, width[0], join)
+
+
 def start(args):
     if DEBUG:
         print(args)
@@ -54,23 +212,24 @@ def start(args):
     else:
         f_out = sys.stdout
 
-    tb2 = args.table2.readlines()
-
-    for line1 in args.table1:
-        row1 = [item.strip(args.quote1) for item in line1.strip().split(args.delimiter1)]
+    rows1 = read_table(args.table1, args.delimiter1, args.quote1)
+    rows2 = read_table(args.table2, args.delimiter2, args.quote2)
 
-        pattern = re.compile(row1[args.key1 - 1])
+    if args.regex and args.sort_merge:
+        raise CLIError("--regex and --sort-merge can not be combined")
 
-        for line2 in tb2:
-            row2 = [item.strip(args.quote2) for item in line2.strip().split(args.delimiter2)]
+    if args.regex:
+        rows = regex_join(rows1, rows2, args.key1, args.key2, args.join, args.quote1)
+    elif args.sort_merge:
+        rows = sort_merge_join(rows1, rows2, args.key1, args.key2, args.join,
+                               max_memory=args.sort_memory * 1024 * 1024, spill_dir=args.temp_dir)
+    else:
+        rows = hash_join(rows1, rows2, args.key1, args.key2, args.join)
 
-            if pattern.search(row2[args.key2 - 1].strip(args.quote1)):
-                if args.quote is not None:
-                    row = [args.quote + item + args.quote for item in row1 + row2]
-                else:
-                    row = row1 + row2
+    write = row_writer(f_out, args.delimiter, args.quote)
 
-                f_out.write(args.delimiter.join(row) + "\n")
+    for row in rows:
+        write(row)
 
 
 def main(argv=None): # IGNORE:C0111
@@ -121,6 +280,16 @@ USAGE
         parser.add_argument('-q', '--quote', type=str, default=None,
                             help="Should quotes used for output table? Default is no quoting.")
         parser.add_argument('-o', '--output', help='Use output file instead of stdout.', type=FileType('w'))
+        parser.add_argument('--join', choices=JOIN_TYPES, default='inner',
+                            help="Join type. inner returns rows with matches in both tables, left also the rows of table 1 without match and anti only the rows of table 1 without match. Default is inner.")
+        parser.add_argument('-r', '--regex', action='store_true',
+                            help="Keys of table 1 are regular expressions which are searched in the keys of table 2. Default is an exact key match.")
+        parser.add_argument('-m', '--sort-merge', action='store_true',
+                            help="Sort both tables by key in temporary files and join them in one pass. For tables larger than the memory. Output is in key order.")
+        parser.add_argument('--sort-memory', type=int, default=512,
+                            help="Memory in MB used for sorting with --sort-merge. Default is 512.")
+        parser.add_argument('--temp-dir', type=str,
+                            help="Folder for temporary sort files. Default is the system temp folder.")
 
         parser.add_argument('--delimiter1',  default='\t', type=str,
                             help='Column Delimiter. Default is tab (\t).')
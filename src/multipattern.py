@@ -0,0 +1,414 @@
+# encoding: utf-8
+"""
+multipattern -- match a large set of fixed strings and regular expressions against a subject
+in a single scan.
+
+Fixed strings are compiled into one Aho-Corasick automaton, so the cost of a search depends on
+the length of the subject and not on the number of strings. Regular expressions are fused into
+one alternation whenever this does not change their meaning.
+
+PatternSet reports all patterns of a large set which match a subject. Every pattern is reduced to a
+fixed string which is part of all its matches. The fixed strings are found with one automaton scan and
+only the patterns of the found strings are confirmed with a regular expression search.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import re
+
+__all__ = ['AhoCorasick', 'MultiPattern', 'PatternSet', 'has_backreference', 'required_literal']
+
+# Characters which make a pattern a real regular expression
+_META = frozenset(b".^$*+?{}[]\\|()")
+# Up to this number of fixed strings a regular expression alternation is faster than the automaton
+_SMALL = 32
+# Backreferences can not be fused because group numbers change in the combined pattern
+_BACKREF = re.compile(rb"\\[1-9]|\(\?P=")
+
+
+def has_backreference(pattern):
+    """Return True if the pattern (str or bytes) refers to its own groups."""
+    return _BACKREF.search(pattern if isinstance(pattern, bytes) else pattern.encode()) is not None
+
+
+def _skip_class(p, i):
+    """Return the index after the character class starting at p[i]."""
+    j = i + 1
+
+    if p[j:j + 1] == "^":
+        j += 1
+
+    if p[j:j + 1] == "]":
+        j += 1
+
+    while j < len(p) and p[j] != "]":
+        j += 2 if p[j] == "\\" else 1
+
+    return j + 1
+
+
+def _skip_escape(p, i):
+    """Return the index after the escape sequence starting at p[i]."""
+    c = p[i + 1:i + 2]
+    j = i + 2
+
+    if c in ("x", "u", "U"):
+        j += {"x": 2, "u": 4, "U": 8}[c]
+    elif c == "N" and p[j:j + 1] == "{":
+        j = p.find("}", j) + 1 or len(p)
+    elif c == "0":
+        # Octal escape with up to 3 digits
+        while j < len(p) and j < i + 4 and p[j] in "01234567":
+            j += 1
+    elif c.isdigit():
+        if p[i + 1:i + 4].isdigit() and all(d in "01234567" for d in p[i + 1:i + 4]):
+            # Octal escape i.e. \101
+            j = i + 4
+        elif p[j:j + 1].isdigit():
+            # Backreference with two digits
+            j += 1
+
+    return min(j, len(p))
+
+
+def _atoms(p):
+    """Split the pattern p into (kind, value, quantifier) with kind 'literal', 'group' or 'other'."""
+    atoms = []
+    i = 0
+
+    while i < len(p):
+        c = p[i]
+
+        if c == "\\":
+            nxt = p[i + 1:i + 2]
+
+            if nxt and not nxt.isalnum():
+                atom = ('literal', nxt)
+                i += 2
+            else:
+                # Character classes, anchors and numeric escapes end the fixed string
+                atom = ('other', None)
+                i = _skip_escape(p, i)
+        elif c == "[":
+            atom = ('other', None)
+            i = _skip_class(p, i)
+        elif c == "(":
+            depth = 0
+            j = i
+
+            while j < len(p):
+                if p[j] == "\\":
+                    j = _skip_escape(p, j)
+                    continue
+                elif p[j] == "[":
+                    j = _skip_class(p, j)
+                    continue
+                elif p[j] == "(":
+                    depth += 1
+                elif p[j] == ")":
+                    depth -= 1
+
+                    if depth == 0:
+                        break
+
+                j += 1
+
+            inner = p[i + 1:j]
+            atom = ('group', inner[2:] if inner.startswith("?:") else inner)
+            i = j + 1
+        elif c in ".^$|":
+            atom = (c, None)
+            i += 1
+        else:
+            atom = ('literal', c)
+            i += 1
+
+        # Quantifier of the atom
+        quantifier = ""
+
+        if i < len(p) and p[i] in "*+?{":
+            j = p.find("}", i) + 1 if p[i] == "{" else i + 1
+            j = len(p) if j <= 0 else j
+
+            if p[j:j + 1] in ("?", "+"):
+                j += 1
+
+            quantifier = p[i:j]
+            i = j
+
+        atoms.append(atom + (quantifier, ))
+
+    return atoms
+
+
+def _literal_runs(p):
+    """Return the fixed strings which are part of every match of p in order or None if p has an
+    alternation."""
+    runs = [""]
+
+    for kind, value, quantifier in _atoms(p):
+        if kind == '|':
+            return None
+        elif kind == 'literal' and quantifier == "":
+            runs[-1] += value
+        elif kind == 'literal' and quantifier[:1] == "+":
+            # One or more times ends the fixed string and starts the next with the same character
+            runs[-1] += value
+            runs.append(value)
+        elif kind == 'group' and quantifier == "":
+            inner = _literal_runs(value)
+
+            if inner is None:
+                runs.append("")
+            else:
+                # Fixed strings at the borders of the group continue outside
+                runs[-1] += inner[0]
+                runs.extend(inner[1:])
+        else:
+            runs.append("")
+
+    return runs
+
+
+def required_literal(pattern):
+    """Return the longest fixed string which is part of every match of pattern or an empty string.
+
+    Groups are included if they are not repeated. Patterns with alternations on the top level, inline
+    flags or lookarounds return an empty string.
+    """
+    is_bytes = isinstance(pattern, bytes)
+    p = pattern.decode('latin-1') if is_bytes else pattern
+    empty = b"" if is_bytes else ""
+
+    if "(?" in p.replace("(?:", ""):
+        return empty
+
+    runs = _literal_runs(p)
+    best = max(runs, key=len) if runs else ""
+
+    return best.encode('latin-1') if is_bytes else best
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over bytes or str keys.
+
+    Keys must all be of the same type as the later searched subjects.
+    """
+    def __init__(self, keys=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._built = False
+
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return sum(1 for out in self._out if out)
+
+    def add(self, key, value=None):
+        """Add key to the automaton. Value is reported by iter() and defaults to the key itself."""
+        state = 0
+
+        for symbol in key:
+            nxt = self._goto[state].get(symbol)
+
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][symbol] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+
+            state = nxt
+
+        self._out[state] = self._out[state] + (key if value is None else value,)
+        self._built = False
+
+    def build(self):
+        """Calculate failure links. Called automatically on first search."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        queue = list(goto[0].values())
+
+        for state in queue:
+            fail[state] = 0
+
+        # Breadth first so failure targets are always finished before they are used
+        for state in queue:
+            for symbol, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+
+                while f and symbol not in goto[f]:
+                    f = fail[f]
+
+                f = goto[f].get(symbol, 0)
+                fail[nxt] = f
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._built = True
+
+    def search(self, text):
+        """Return True if any key occurs in text."""
+        if not self._built:
+            self.build()
+
+        if self._out[0]:
+            return True
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        state = 0
+
+        for symbol in text:
+            while True:
+                nxt = goto[state].get(symbol)
+
+                if nxt is not None:
+                    state = nxt
+                    break
+
+                if state == 0:
+                    break
+
+                state = fail[state]
+
+            if out[state]:
+                return True
+
+        return False
+
+    def iter(self, text):
+        """Yield (end, value) for all key occurrences in text. End is the index after the match."""
+        if not self._built:
+            self.build()
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        state = 0
+
+        for value in out[0]:
+            yield 0, value
+
+        for i, symbol in enumerate(text, 1):
+            while True:
+                nxt = goto[state].get(symbol)
+
+                if nxt is not None:
+                    state = nxt
+                    break
+
+                if state == 0:
+                    break
+
+                state = fail[state]
+
+            for value in out[state]:
+                yield i, value
+
+
+class MultiPattern:
+    """Match a subject against many patterns at once.
+
+    Patterns without regular expression meta characters (or all patterns if fixed_strings is set)
+    are searched with an Aho-Corasick automaton. All other patterns are joined into one regular
+    expression where possible. search() returns True if any of the patterns matches.
+    """
+    def __init__(self, patterns, fixed_strings=False):
+        literals = []
+        fusable = []
+        self._regex = []
+
+        for p in patterns:
+            if fixed_strings or not _META.intersection(p if isinstance(p, bytes) else p.encode()):
+                literals.append(p)
+            elif _BACKREF.search(p if isinstance(p, bytes) else p.encode()):
+                self._regex.append(re.compile(p))
+            else:
+                fusable.append(p)
+
+        self._automaton = None
+
+        if 0 < len(literals) <= _SMALL and all(literals):
+            fusable.extend(re.escape(p) for p in literals)
+        elif literals:
+            self._automaton = AhoCorasick(literals)
+            self._automaton.build()
+
+        if len(fusable) == 1:
+            self._regex.append(re.compile(fusable[0]))
+        elif fusable:
+            if isinstance(fusable[0], bytes):
+                combined = b"|".join([b"(?:" + p + b")" for p in fusable])
+            else:
+                combined = "|".join(["(?:" + p + ")" for p in fusable])
+
+            try:
+                self._regex.append(re.compile(combined))
+            except (re.error, OverflowError, RecursionError):
+                # i.e. inline global flags inside single patterns
+                self._regex.extend(re.compile(p) for p in fusable)
+
+    def search(self, subject):
+        """Return True if at least one pattern is found in subject."""
+        if self._automaton is not None and self._automaton.search(subject):
+            return True
+
+        for p in self._regex:
+            if p.search(subject):
+                return True
+
+        return False
+
+
+class PatternSet:
+    """Find all patterns of a large set which match a subject.
+
+    Patterns without regular expression meta characters are found by the automaton alone. Regular
+    expressions are only searched if their fixed string (see required_literal) is found. Patterns
+    without fixed string are searched in every subject.
+    """
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._automaton = AhoCorasick()
+        self._confirm = []
+        self._always = []
+
+        for i, p in enumerate(self.patterns):
+            if not _META.intersection(p if isinstance(p, bytes) else p.encode()):
+                literal = p
+                self._confirm.append(None)
+            else:
+                literal = required_literal(p)
+                self._confirm.append(re.compile(p))
+
+            if literal:
+                self._automaton.add(literal, i)
+            else:
+                self._always.append(i)
+
+        self._automaton.build()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def matches(self, subject):
+        """Return the sorted indices of all patterns found in subject."""
+        confirm = self._confirm
+        found = [i for i in {i for _, i in self._automaton.iter(subject)}
+                 if confirm[i] is None or confirm[i].search(subject)]
+        found.extend(i for i in self._always if confirm[i] is None or confirm[i].search(subject))
+        found.sort()
+
+        return found
@@ -0,0 +1,71 @@
+# encoding: utf-8
+"""
+poolmap -- map tasks to a multiprocessing pool with a bounded number of tasks in flight
+
+pool.imap() submits all tasks at once and collects the results in the parent process as fast as the
+workers produce them. If the consumer is slower (i.e. writing the output) or stops early, finished
+results pile up in memory. bounded_imap() submits a new task only when a result is taken, so at most
+window results are pending.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import queue
+
+from collections import deque
+from itertools import islice
+
+__all__ = ['bounded_imap']
+
+
+def bounded_imap(pool, func, tasks, window, ordered=True):
+    """Yield func(task) for all tasks computed by the multiprocessing pool with at most window tasks in
+    flight. Results are in task order like pool.imap or without ordered as they complete like
+    pool.imap_unordered. Errors of func are raised when their result is taken."""
+    tasks = iter(tasks)
+    window = max(window, 1)
+
+    if ordered:
+        pending = deque(pool.apply_async(func, (task, )) for task in islice(tasks, window))
+
+        while pending:
+            result = pending.popleft().get()
+
+            # Keep the workers busy while the result is consumed
+            for task in islice(tasks, 1):
+                pending.append(pool.apply_async(func, (task, )))
+
+            yield result
+
+        return
+
+    done = queue.Queue()
+    in_flight = 0
+
+    def submit(task):
+        pool.apply_async(func, (task, ), callback=lambda r: done.put((True, r)),
+                         error_callback=lambda e: done.put((False, e)))
+
+    for task in islice(tasks, window):
+        submit(task)
+        in_flight += 1
+
+    while in_flight:
+        ok, result = done.get()
+        in_flight -= 1
+
+        if not ok:
+            raise result
+
+        for task in islice(tasks, 1):
+            submit(task)
+            in_flight += 1
+
+        yield result
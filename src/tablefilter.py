@@ -0,0 +1,224 @@
+# encoding: utf-8
+"""
+tablefilter -- typed filter expressions over the columns of delimited tables
+
+Expressions like "pident > 85 and evalue < 1e-50" are parsed with the ast module. Only comparisons,
+boolean and arithmetic operators, numbers, strings and column names are allowed. Columns are named
+c1, c2, ... or by their BLAST tabular (-outfmt 6) names qseqid, sseqid, pident, ... Columns are
+separated by whitespace or a given delimiter.
+
+Lines are filtered in batches. Values which are numbers are compared as numbers and all other values as
+strings. With NumPy the referenced columns of a batch are converted to arrays and the expression is
+evaluated once for the whole batch. Without NumPy, or if a batch can not be evaluated as arrays (i.e.
+short lines, strings compared with numbers or division by zero), the expression is evaluated row by
+row. Rows which can not be evaluated do not match.
+
+@author:     Norbert Auer
+
+@copyright:  Copyright 2014 University of Natural Resources and Life Sciences, Vienna. All rights reserved.
+
+@license:    license
+
+@contact:    norbert.auer@boku.ac.at
+@deffield    updated: Updated
+"""
+
+import ast
+import re
+
+from functools import reduce
+from itertools import islice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['WhereFilter', 'BLAST_COLUMNS']
+
+# Column names of BLAST -outfmt 6
+BLAST_COLUMNS = ['qseqid', 'sseqid', 'pident', 'length', 'mismatch', 'gapopen',
+                 'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore']
+# Lines evaluated at once
+BATCH_SIZE = 4096
+
+_ALLOWED = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+            ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.Compare,
+            ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq, ast.Name, ast.Load, ast.Constant)
+
+_COLUMN = re.compile(r"c([1-9]\d*)$")
+
+# Errors of rows or batches which can not be evaluated
+_EVAL_ERRORS = (TypeError, ValueError, IndexError, ArithmeticError)
+
+
+def column_index(name):
+    """Return the 0-based index of the column name (c1, c2, ... or a BLAST column name)."""
+    if name in BLAST_COLUMNS:
+        return BLAST_COLUMNS.index(name)
+
+    match = _COLUMN.match(name)
+
+    if match is None:
+        raise ValueError("Unknown column {}. Use c1, c2, ... or {}".format(name, ", ".join(BLAST_COLUMNS)))
+
+    return int(match.group(1)) - 1
+
+
+def _value(s):
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+
+class _Columns(ast.NodeTransformer):
+    # Replaces column names by the variables _c<index>
+    def __init__(self):
+        self.columns = set()
+
+    def visit_Name(self, node):
+        i = column_index(node.id)
+        self.columns.add(i)
+
+        return ast.copy_location(ast.Name(id="_c{}".format(i), ctx=ast.Load()), node)
+
+
+class _Vectorize(ast.NodeTransformer):
+    # Rewrites boolean operators and chained comparisons to the element wise operators of arrays
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+
+        return reduce(lambda left, right: ast.BinOp(left=left, op=op, right=right),
+                      [_call_bool(value) for value in node.values])
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=_call_bool(node.operand))
+
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        pairs = [ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+                 for i, op in enumerate(node.ops)]
+
+        return reduce(lambda left, right: ast.BinOp(left=left, op=ast.BitAnd(), right=right), pairs)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.op, (ast.Div, ast.Mod)):
+            node.right = ast.Call(func=ast.Name(id="_nonzero", ctx=ast.Load()), args=[node.right], keywords=[])
+
+        return node
+
+
+def _call_bool(node):
+    return ast.Call(func=ast.Name(id="_bool", ctx=ast.Load()), args=[node], keywords=[])
+
+
+def _to_bool(value):
+    return numpy.asarray(value).astype(bool)
+
+
+def _nonzero(value):
+    # Division by zero fails in row mode also for divisions of inf or nan
+    if numpy.any(numpy.asarray(value) == 0):
+        raise ZeroDivisionError("division by zero")
+
+    return value
+
+
+class WhereFilter:
+    """Filter of delimited lines by a column expression."""
+    def __init__(self, expression, delimiter=None):
+        self.expression = expression
+        self.delimiter = delimiter
+
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError("Invalid expression {}: {}".format(expression, e.msg))
+
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED):
+                raise ValueError("{} is not allowed in expression {}".format(type(node).__name__, expression))
+
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+                raise ValueError("{!r} is not allowed in expression {}".format(node.value, expression))
+
+        columns = _Columns()
+        tree = ast.fix_missing_locations(columns.visit(tree))
+        self.columns = sorted(columns.columns)
+        self._row_code = compile(tree, '<where>', 'eval')
+        self._vector_code = None
+
+        if numpy is not None:
+            self._vector_code = compile(ast.fix_missing_locations(_Vectorize().visit(tree)), '<where>', 'eval')
+
+    def __reduce__(self):
+        # Code objects can not be pickled i.e. for worker processes
+        return WhereFilter, (self.expression, self.delimiter)
+
+    def _match_row(self, row):
+        try:
+            namespace = {"_c{}".format(i): _value(row[i]) for i in self.columns}
+            namespace['__builtins__'] = {}
+
+            return bool(eval(self._row_code, namespace))
+        except _EVAL_ERRORS:
+            return False
+
+    def _vector_mask(self, rows):
+        namespace = {'__builtins__': {}, '_bool': _to_bool, '_nonzero': _nonzero}
+
+        for i in self.columns:
+            values = [row[i] for row in rows]
+
+            try:
+                namespace["_c{}".format(i)] = numpy.array(values, dtype=float)
+            except ValueError:
+                # Numbers of a mixed column are still compared as numbers
+                namespace["_c{}".format(i)] = numpy.array([_value(v) for v in values], dtype=object)
+
+        # Overflow raises in row mode. Batches with floating point errors are evaluated row by row.
+        with numpy.errstate(all='raise'):
+            result = eval(self._vector_code, namespace)
+
+        return numpy.broadcast_to(_to_bool(result), (len(rows), )).tolist()
+
+    def mask(self, lines):
+        """Return a list of booleans which lines match."""
+        if self.delimiter is None:
+            rows = [line.split() for line in lines]
+        else:
+            rows = [line.rstrip("\r\n").split(self.delimiter) for line in lines]
+
+        if self._vector_code is not None:
+            try:
+                return self._vector_mask(rows)
+            except _EVAL_ERRORS:
+                pass
+
+        return [self._match_row(row) for row in rows]
+
+    def filter(self, lines, unmatch=None):
+        """Yield the lines which match the expression. Other lines are written to unmatch."""
+        lines = iter(lines)
+
+        while True:
+            batch = list(islice(lines, BATCH_SIZE))
+
+            if not batch:
+                return
+
+            for line, keep in zip(batch, self.mask(batch)):
+                if keep:
+                    yield line
+                elif unmatch:
+                    unmatch.write(line)
@@ -0,0 +1,71 @@
+# encoding: utf-8
+"""
+Tests of the open addressing digest set in digestset.
+
+Usage: python3 -m pytest test
+"""
+
+import hashlib
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from digestset import DigestSet
+
+
+class DigestSetTest(unittest.TestCase):
+    def check(self, digests, **kwargs):
+        digest_set = DigestSet(**kwargs)
+        seen = set()
+
+        for digest in digests:
+            self.assertEqual(digest_set.add(digest), digest not in seen)
+            seen.add(digest)
+
+        self.assertEqual(len(digest_set), len(seen))
+
+        for digest in seen:
+            self.assertIn(digest, digest_set)
+
+        return digest_set
+
+    def test_add(self):
+        rnd = random.Random(1)
+        values = [str(rnd.randrange(3000)).encode() for _ in range(5000)]
+
+        for bits in (64, 128):
+            self.check([hashlib.blake2b(v, digest_size=bits // 8).digest() for v in values], bits=bits, capacity=2)
+
+        self.assertEqual(DigestSet().bits, 128)
+
+    def test_zero_digest(self):
+        # The empty slot marker is a valid digest too
+        digest_set = self.check([bytes(16), (2).to_bytes(16, 'little'), bytes(16)])
+
+        self.assertEqual(len(digest_set), 2)
+
+    def test_collisions(self):
+        # Same first word: distinguished by the second word only with 128 bits
+        digests = [bytes(8) + i.to_bytes(8, 'little') for i in range(1, 100)]
+
+        self.assertEqual(len(self.check(digests, bits=128)), 99)
+
+        digest_set = DigestSet(bits=64)
+        self.assertEqual(sum(digest_set.add(d) for d in digests), 1)
+
+    def test_spill(self):
+        rnd = random.Random(2)
+        digests = [rnd.getrandbits(128).to_bytes(16, 'little') for _ in range(3000)]
+        digest_set = self.check(digests + digests[:100], max_memory=1024)
+
+        self.assertIsNotNone(digest_set._spill_file)
+
+    def test_bits(self):
+        self.assertRaises(ValueError, DigestSet, bits=32)
+
+
+if __name__ == "__main__":
+    unittest.main()
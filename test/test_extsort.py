@@ -0,0 +1,106 @@
+# encoding: utf-8
+"""
+Tests of the external merge sort and the top k selection in extsort.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import pickle
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import extsort
+
+from extsort import external_sort, top_k, typed_key, ReverseKey
+
+
+class ExternalSortTest(unittest.TestCase):
+    def setUp(self):
+        self.max_runs = extsort.MAX_RUNS
+        self.write_run = extsort._write_run
+        self.runs = 0
+
+        def write_run(items, spill_dir):
+            self.runs += 1
+            return self.write_run(items, spill_dir)
+
+        extsort._write_run = write_run
+
+    def tearDown(self):
+        extsort.MAX_RUNS = self.max_runs
+        extsort._write_run = self.write_run
+
+    def check(self, items, **kwargs):
+        key = lambda item: item[0]
+        result = list(external_sort(items, key=key, **kwargs))
+
+        # sorted is stable too
+        self.assertEqual(result, sorted(items, key=key))
+
+    def test_in_memory(self):
+        rnd = random.Random(1)
+        self.check([(rnd.randrange(50), i) for i in range(1000)])
+        self.check([])
+        self.assertEqual(self.runs, 0)
+
+    def test_spill(self):
+        rnd = random.Random(2)
+
+        # Every 64th item adds 64 to the estimated size, which spills a run every 128 items
+        self.check([(rnd.randrange(50), i) for i in range(5000)], max_memory=100, item_size=lambda item: 1)
+        self.assertGreater(self.runs, 30)
+
+    def test_key_size(self):
+        rnd = random.Random(5)
+        items = [(str(rnd.random()), i) for i in range(1000)]
+
+        # Items without size still spill because of their keys
+        result = list(external_sort(items, key=lambda item: typed_key(item[0], True), max_memory=10000,
+                                    item_size=lambda item: 0))
+        self.assertEqual(result, sorted(items, key=lambda item: float(item[0]), reverse=True))
+        self.assertGreater(self.runs, 0)
+
+    def test_merge_runs(self):
+        rnd = random.Random(3)
+        extsort.MAX_RUNS = 3
+
+        self.check([(rnd.randrange(50), i) for i in range(5000)], max_memory=100, item_size=lambda item: 1)
+        self.check([(rnd.randrange(50), i) for i in range(129)], max_memory=100, item_size=lambda item: 1)
+
+    def test_typed_key(self):
+        values = ["10", "b", 2, "1e3", "a", "-1", "nan", "B", 2.5]
+
+        self.assertEqual(sorted(values, key=typed_key), ["-1", 2, 2.5, "10", "1e3", "B", "a", "b", "nan"])
+        # Descending is the exact reverse, strings come first
+        self.assertEqual(sorted(values, key=lambda v: typed_key(v, True)),
+                         ["nan", "b", "a", "B", "1e3", "10", 2.5, 2, "-1"])
+
+        # Keys of descending string columns are spilled too
+        key = pickle.loads(pickle.dumps(typed_key("a", True)))
+        self.assertEqual(key[1].value, "a")
+        self.assertLess(ReverseKey("b"), ReverseKey("a"))
+
+
+class TopKTest(unittest.TestCase):
+    def test_top_k(self):
+        rnd = random.Random(4)
+        items = [(rnd.randrange(5), rnd.randrange(20), i) for i in range(500)]
+        key = lambda item: item[1]
+
+        for k in (0, 1, 3, 1000):
+            self.assertEqual(top_k(items, k, key), sorted(items, key=key)[:k])
+
+            expected = []
+
+            for group in sorted(set(item[0] for item in items), key=lambda g: [i[0] for i in items].index(g)):
+                expected.extend(sorted([item for item in items if item[0] == group], key=key)[:k])
+
+            self.assertEqual(top_k(items, k, key, group=lambda item: item[0]), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+# encoding: utf-8
+"""
+Tests of the id lookup, sampling, counting, parallel processing and output names of fastagrep.
+
+BioPylib is replaced by a minimal Fasta class if it is not installed.
+
+Usage: python3 -m pytest test
+"""
+
+import gzip
+import importlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+try:
+    importlib.import_module('BioPylib.BioPylib')
+except ImportError:
+    class Fasta:
+        def __init__(self, header, seq):
+            self._header = header
+            self._seq = seq
+
+        def get_header(self):
+            return self._header
+
+        def get_sequence(self):
+            return self._seq
+
+        def get_seq_length(self):
+            return len(self._seq)
+
+        def __getitem__(self, key):
+            return Fasta(self._header, self._seq[key])
+
+    biopylib = types.ModuleType('BioPylib.BioPylib')
+    biopylib.Fasta = Fasta
+    biopylib.Alphabeth = None
+    sys.modules['BioPylib'] = types.ModuleType('BioPylib')
+    sys.modules['BioPylib.BioPylib'] = biopylib
+
+import fastagrep
+
+from digestset import DigestSet
+from fastaindex import FastaIndex
+from fastaio import read_records
+from multipattern import MultiPattern
+from fastagrep import (CLIError, KeyMatcher, reservoir_sample, count_file, chunk_ranges, select_fasta, process_fasta,
+                       process_parallel, output_name, check_output_names)
+
+
+def make_args(**options):
+    """Arguments of fastagrep after the option checks of start()."""
+    args = Namespace(header_pattern='^>', invert_match=False, index=False, key_pattern=None, rm_duplicates=False,
+                     dedupe='header', dedupe_bits=128, start=-1, length=-1, min_length=0, max_length=0,
+                     cut_to_size=-1, reverse_transcript=None, summary=False, summary_no_header=False, stats=None,
+                     line_length=60, jobs=1, sample=None, fraction=None, seed=None, count_length=False,
+                     unordered=False, output_template=None)
+    vars(args).update(options)
+
+    return args
+
+
+def random_fasta(rnd, count):
+    records = []
+
+    for i in range(count):
+        header = ">gi|{}|ref|{}| seq {}".format(rnd.randrange(10 ** 6), rnd.choice(["A", "B"]), i).encode()
+        seq = bytes(rnd.choice(b"ACGT") for _ in range(rnd.randint(0, 150)))
+        records.append((header, seq))
+
+    data = b"".join(header + b"\n" + b"".join(seq[j:j + 60] + b"\n" for j in range(0, len(seq), 60))
+                    for header, seq in records)
+
+    return records, data
+
+
+class FastaFileTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.name = os.path.join(self.folder, 'test.fa')
+        self.records, self.data = random_fasta(random.Random(1), 300)
+
+        with open(self.name, 'wb') as f_out:
+            f_out.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+
+class KeyMatcherTest(FastaFileTest):
+    def test_exact_key(self):
+        header = b">gi|41234|ref|XM_1| description"
+
+        # A pattern search for the id 123 also finds gi 41234
+        self.assertTrue(MultiPattern([b"123"]).search(header))
+        self.assertFalse(KeyMatcher([b"123"], rb"gi\|(\d+)\|").search(header))
+        self.assertTrue(KeyMatcher([b"41234"], rb"gi\|(\d+)\|").search(header))
+        self.assertTrue(KeyMatcher([b"gi|41234|ref|XM_1|"]).search(header))
+        self.assertFalse(KeyMatcher([b"gi|41234"]).search(header))
+        self.assertTrue(KeyMatcher([b"gi|41234|"], rb"gi\|\d+\|").search(header))
+        self.assertFalse(KeyMatcher([b"123"], rb"nothing(\d+)").search(header))
+
+    def test_select(self):
+        index = FastaIndex.build(self.name)
+        headers = [header for header, _ in self.records]
+        ids = [header.split()[0][1:] for header in random.Random(2).sample(headers, 50)]
+        gis = [i.split(b"|")[1] for i in ids]
+
+        for matcher in (KeyMatcher(ids + [b"unknown"]), KeyMatcher(gis + [b"0"], rb"gi\|(\d+)\|")):
+            for invert in (False, True):
+                expected = [h for h in headers if matcher.search(h) != invert]
+                self.assertEqual([e.header for e in matcher.select(index, invert)], expected)
+
+                with open(self.name, 'rb') as f_in:
+                    args = make_args(invert_match=invert)
+                    self.assertEqual([r.header for r in select_fasta(f_in, args, matcher, index)], expected)
+
+
+class SampleTest(unittest.TestCase):
+    def records(self, count):
+        return [types.SimpleNamespace(body_offset=0, i=i) for i in range(count)]
+
+    def sample(self, count, k, seed):
+        return [r.i for r in reservoir_sample(self.records(count), k, random.Random(seed))]
+
+    def test_size_and_order(self):
+        for count, k in [(0, 3), (2, 3), (3, 3), (100, 0), (100, 1), (100, 10), (10000, 50)]:
+            sample = self.sample(count, k, 1)
+
+            self.assertEqual(len(sample), min(count, k))
+            self.assertEqual(sample, sorted(set(sample)))
+            self.assertTrue(all(0 <= i < count for i in sample))
+
+    def test_seed(self):
+        self.assertEqual(self.sample(1000, 20, 7), self.sample(1000, 20, 7))
+        self.assertNotEqual(self.sample(1000, 20, 7), self.sample(1000, 20, 8))
+
+    def test_uniform(self):
+        counts = [0] * 10
+
+        for seed in range(3000):
+            for i in self.sample(10, 3, seed):
+                counts[i] += 1
+
+        # Every position is expected 900 times
+        self.assertTrue(all(750 < n < 1050 for n in counts), counts)
+
+
+class CountTest(FastaFileTest):
+    def test_count(self):
+        lengths = [len(seq) for _, seq in self.records]
+
+        with open(self.name, 'rb') as f_in:
+            self.assertEqual(count_file(f_in, make_args(), MultiPattern([b"."])), (300, 0, 0))
+
+        for options in ({'count_length': True}, {'count_length': True, 'min_length': 50, 'max_length': 100}):
+            args = make_args(**options)
+            selected = [n for n in lengths if n >= args.min_length and (not args.max_length or n <= args.max_length)]
+
+            with open(self.name, 'rb') as f_in:
+                self.assertEqual(count_file(f_in, args, MultiPattern([b"."])), (len(selected), sum(selected), 0))
+
+        # Compressed input and a pattern
+        with open(self.name + ".gz", 'wb') as f_out:
+            f_out.write(gzip.compress(self.data))
+
+        expected = [n for header, seq in self.records if b"|A|" in header for n in [len(seq)]]
+
+        with open(self.name + ".gz", 'rb') as f_in:
+            self.assertEqual(count_file(f_in, make_args(count_length=True), MultiPattern([b"|A|"], fixed_strings=True)),
+                             (len(expected), sum(expected), 0))
+
+    def test_duplicates(self):
+        with open(self.name, 'ab') as f_out:
+            f_out.write(self.data[:self.data.index(self.records[10][0])])
+
+        with open(self.name, 'rb') as f_in:
+            self.assertEqual(count_file(f_in, make_args(), MultiPattern([b"."]), DigestSet()), (300, 0, 10))
+
+
+class ParallelTest(FastaFileTest):
+    def setUp(self):
+        super().setUp()
+        self.chunk_size = fastagrep.CHUNK_SIZE
+        # Many byte ranges for the small file
+        fastagrep.CHUNK_SIZE = 1000
+
+    def tearDown(self):
+        fastagrep.CHUNK_SIZE = self.chunk_size
+        super().tearDown()
+
+    def test_chunk_ranges(self):
+        for chunks in (1, 2, 7, 100, 10000):
+            ranges = chunk_ranges(self.name, chunks, '^>')
+
+            self.assertLessEqual(len(ranges), chunks)
+            self.assertEqual(b"".join(self.data[start:end] for start, end in ranges), self.data)
+            self.assertTrue(all(self.data.startswith(b">", start) for start, _ in ranges))
+
+    def test_serial_output(self):
+        for options, matcher in [({}, MultiPattern([b"."])),
+                                 ({'invert_match': True}, MultiPattern([b"|A|"], fixed_strings=True)),
+                                 ({'min_length': 70}, MultiPattern([b"."])),
+                                 ({'start': 5, 'length': 20, 'summary_no_header': True}, MultiPattern([b"seq 1"])),
+                                 ({'rm_duplicates': True}, MultiPattern([b"."]))]:
+            args = make_args(**options)
+
+            with open(self.name, 'rb') as f_in:
+                serial = list(process_fasta(select_fasta(f_in, args, matcher), args))
+
+            args.jobs = 3
+            self.assertEqual(list(process_parallel(self.name, args, matcher)), serial, options)
+            self.assertTrue(any(text for _, _, text, _ in serial))
+
+    def test_close(self):
+        args = make_args(jobs=2)
+        results = process_parallel(self.name, args, MultiPattern([b"."]))
+        first = next(results)
+        results.close()
+
+        with open(self.name, 'rb') as f_in:
+            self.assertEqual(first, next(process_fasta(read_records(f_in), args)))
+
+
+class OutputNameTest(unittest.TestCase):
+    def test_output_name(self):
+        self.assertEqual(output_name("data/reads.fa", "{dir}/{basename}.filtered{ext}"), "data/reads.filtered.fa")
+        self.assertEqual(output_name("data/reads.fa.gz", "out/{basename}{ext}"), "out/reads.fa")
+        self.assertEqual(output_name("reads.fa", "{dir}/{name}.out"), "./reads.fa.out")
+
+    def test_check_output_names(self):
+        folder = tempfile.mkdtemp()
+        names = [os.path.join(folder, name) for name in ("a.fa", "b.fa", "b.fa.gz")]
+
+        try:
+            for name in names:
+                open(name, 'wb').close()
+
+            check_output_names(names[:2], "{dir}/{basename}.out{ext}")
+
+            # Outputs would truncate an input or be written twice
+            for template in ("{dir}/{name}", "{dir}/{basename}{ext}", names[0], "{dir}/all.fa"):
+                self.assertRaises(CLIError, check_output_names, names[:2], template)
+
+            self.assertRaises(CLIError, check_output_names, names[1:], "{dir}/{basename}.out{ext}")
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    unittest.main()
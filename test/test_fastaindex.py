@@ -0,0 +1,84 @@
+# encoding: utf-8
+"""
+Tests of the persistent fasta index in fastaindex.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from fastaindex import FastaIndex
+from fastaio import read_records, read_indexed
+
+DATA = b">seq1 first\nACGTACGT\nACGT\n>seq2\nAAAA\nCC\nGGGG\n>seq3 empty\n>seq1 again\nTTTTTTTT\nTT\n"
+
+
+class FastaIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.name = os.path.join(self.folder, 'test.fa')
+
+        with open(self.name, 'wb') as f_out:
+            f_out.write(DATA)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_entries(self):
+        index = FastaIndex.build(self.name)
+
+        self.assertEqual([e.name for e in index], [b"seq1", b"seq2", b"seq3", b"seq1"])
+        self.assertEqual([e.length for e in index], [12, 10, 0, 10])
+        self.assertEqual([e.uniform for e in index], [True, False, True, True])
+        self.assertEqual(len(index.get(b"seq1")), 2)
+        self.assertNotIn(b"seq4", index)
+
+        with open(self.name, 'rb') as f_in:
+            self.assertEqual(index.read_record(f_in, index.get(b"seq2")[0]), b">seq2\nAAAA\nCC\nGGGG\n")
+
+    def test_read_indexed(self):
+        index = FastaIndex.build(self.name)
+        entries = [index.get(b"seq2")[0], index.get(b"seq1")[1], index.get(b"seq3")[0]]
+
+        with open(self.name, 'rb') as f_in:
+            records = {r.offset: (r.header, r.sequence()) for r in read_records(f_in)}
+            indexed = [(r.offset, r.header, r.sequence()) for r in read_indexed(f_in, entries)]
+
+        self.assertEqual(indexed, [(e.header_offset, ) + records[e.header_offset] for e in entries])
+
+    def test_round_trip(self):
+        index = FastaIndex.open(self.name)
+        fai, fah = FastaIndex.sidecars(self.name)
+
+        self.assertTrue(os.path.exists(fai) and os.path.exists(fah))
+        self.assertEqual(list(FastaIndex.load(self.name)), list(index))
+
+        # samtools faidx columns
+        with open(fai, 'rb') as f_fai:
+            self.assertEqual(f_fai.readline(), b"seq1\t12\t12\t8\t9\n")
+
+    def test_outdated(self):
+        FastaIndex.open(self.name)
+
+        with open(self.name, 'ab') as f_out:
+            f_out.write(b">seq4\nA\n")
+
+        self.assertIsNone(FastaIndex.load(self.name))
+        self.assertIsNone(FastaIndex.open(self.name, build=False))
+        self.assertEqual(len(FastaIndex.open(self.name)), 5)
+
+    def test_not_saved(self):
+        index = FastaIndex.open(self.name, save=False)
+
+        self.assertEqual(len(index), 4)
+        self.assertEqual(os.listdir(self.folder), ['test.fa'])
+
+
+if __name__ == "__main__":
+    unittest.main()
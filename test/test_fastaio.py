@@ -0,0 +1,210 @@
+# encoding: utf-8
+"""
+Tests of the fasta readers and writers in fastaio.
+
+Usage: python3 -m pytest test
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import fastaio
+
+from fastaio import detect_compression, open_input, read_records, format_record, FastaWriter
+from fastaio import _ThreadedReader
+
+
+def parse(data):
+    """Reference parser: (header, sequence) of every record."""
+    records = []
+
+    for line in data.splitlines():
+        if line.startswith(b">"):
+            records.append([line.rstrip(b"\r"), b""])
+        elif records:
+            records[-1][1] += b"".join(line.split())
+
+    return [tuple(record) for record in records]
+
+
+def bgzf_block(data):
+    """One BGZF block (gzip member with the BC extra field) of data."""
+    compress = zlib.compressobj(6, zlib.DEFLATED, -15)
+    cdata = compress.compress(data) + compress.flush()
+    header = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff" + struct.pack("<HccHH", 6, b"B", b"C", 2, len(cdata) + 25)
+
+    return header + cdata + struct.pack("<II", zlib.crc32(data), len(data))
+
+
+def random_fasta(rnd, newline=b"\n"):
+    lines = []
+
+    for i in range(rnd.randint(0, 20)):
+        lines.append(">seq{} description {}".format(i, rnd.random()).encode())
+        seq = bytes(rnd.choice(b"ACGTN") for _ in range(rnd.randint(0, 300)))
+        width = rnd.randint(1, 80)
+        lines.extend(seq[j:j + width] for j in range(0, len(seq), width))
+
+        if rnd.random() < 0.2:
+            lines.append(b"")
+
+    return newline.join(lines) + (newline if rnd.random() < 0.8 else b"")
+
+
+class ReadRecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.block_size = fastaio.BLOCK_SIZE
+        self.tmp = tempfile.NamedTemporaryFile(suffix='.fa', delete=False)
+        self.tmp.close()
+
+    def tearDown(self):
+        fastaio.BLOCK_SIZE = self.block_size
+        os.unlink(self.tmp.name)
+
+    def read_all(self, data, **kwargs):
+        """Records of data read memory mapped, in blocks and line by line."""
+        with open(self.tmp.name, 'wb') as f_out:
+            f_out.write(data)
+
+        results = []
+
+        with open(self.tmp.name, 'rb') as f_in:
+            results.append([(r.header, r.sequence()) for r in read_records(f_in, **kwargs)])
+
+        results.append([(r.header, r.sequence()) for r in read_records(io.BytesIO(data), **kwargs)])
+        results.append([(r.header, r.sequence()) for r in read_records(io.BytesIO(data), header_pattern='^>\\w')])
+
+        return results
+
+    def test_crlf(self):
+        data = b">a x\r\nAC\r\nGT\r\n>b\r\n\r\nTT"
+
+        for records in self.read_all(data):
+            self.assertEqual(records, [(b">a x", b"ACGT"), (b">b", b"TT")])
+
+    def test_block_boundaries(self):
+        rnd = random.Random(1)
+
+        # Small blocks put headers, line breaks and CRLF pairs on the block borders
+        for block_size in (1, 2, 3, 7, 64):
+            fastaio.BLOCK_SIZE = block_size
+
+            for _ in range(20):
+                data = random_fasta(rnd, rnd.choice([b"\n", b"\r\n"]))
+
+                for records in self.read_all(data):
+                    self.assertEqual(records, parse(data))
+
+    def test_offsets_and_lengths(self):
+        data = random_fasta(random.Random(2))
+
+        with open(self.tmp.name, 'wb') as f_out:
+            f_out.write(data)
+
+        with open(self.tmp.name, 'rb') as f_in:
+            for record in read_records(f_in):
+                self.assertTrue(data.startswith(record.header, record.offset))
+                self.assertEqual(record.seq_length(), len(record.sequence()))
+
+    def test_end(self):
+        data = b">a\nAC\n>b\nGT\n>c\nTT\n"
+
+        with open(self.tmp.name, 'wb') as f_out:
+            f_out.write(data)
+
+        with open(self.tmp.name, 'rb') as f_in:
+            f_in.seek(6)
+            self.assertEqual([r.header for r in read_records(f_in, end=12)], [b">b"])
+
+
+class CompressionTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = random_fasta(random.Random(3))
+
+        for name, compress in [('gzip', gzip.compress), ('bz2', bz2.compress), ('xz', lzma.compress)]:
+            f_in = io.BufferedReader(io.BytesIO(compress(data)))
+            self.assertEqual(detect_compression(f_in), name)
+            self.assertEqual(open_input(f_in).read(), data)
+
+        self.assertIsNone(detect_compression(io.BufferedReader(io.BytesIO(data))))
+
+    def test_bgzf(self):
+        rnd = random.Random(4)
+        data = random_fasta(rnd)
+
+        # Blocks end inside of headers, sequence lines and line breaks
+        for size in (1, 7, 100, 5000):
+            compressed = b"".join(bgzf_block(data[i:i + size]) for i in range(0, len(data), size)) + bgzf_block(b"")
+            self.assertEqual(gzip.decompress(compressed), data)
+
+            f_in = io.BufferedReader(io.BytesIO(compressed))
+            self.assertEqual(detect_compression(f_in), 'bgzf')
+
+            records = [(r.header, r.sequence()) for r in read_records(open_input(f_in, threads=3))]
+            self.assertEqual(records, parse(data))
+
+    @unittest.skipIf(fastaio.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        data = random_fasta(random.Random(5))
+        f_in = io.BufferedReader(io.BytesIO(fastaio.zstandard.ZstdCompressor().compress(data)))
+
+        self.assertEqual(detect_compression(f_in), 'zstd')
+        self.assertEqual(open_input(f_in).read(), data)
+
+    def test_zstd_missing(self):
+        zstandard = fastaio.zstandard
+        fastaio.zstandard = None
+
+        try:
+            self.assertRaises(IOError, open_input, io.BufferedReader(io.BytesIO(b"\x28\xb5\x2f\xfd" + bytes(20))))
+        finally:
+            fastaio.zstandard = zstandard
+
+    def test_close(self):
+        for end in (None, IOError("broken")):
+            def chunks():
+                for _ in range(fastaio.QUEUE_SIZE):
+                    yield b"ACGT"
+
+                if end is not None:
+                    raise end
+
+            # The producer waits with the end of the input on the full queue until the reader is closed
+            reader = _ThreadedReader(chunks())
+            time.sleep(0.2)
+            reader.close()
+            reader._thread.join(5)
+
+            self.assertFalse(reader._thread.is_alive())
+
+
+class WriterTest(unittest.TestCase):
+    def test_format_record(self):
+        self.assertEqual(format_record(b">a", b"ACGTA", 2), b">a\nAC\nGT\nA\n")
+        self.assertEqual(format_record(b">a", b"ACGTA", 0), b">a\nACGTA\n")
+        self.assertEqual(format_record(b">a", b""), b">a\n")
+
+    def test_buffered_writer(self):
+        f_out = io.BytesIO()
+        writer = FastaWriter(f_out, line_length=3, buffer_size=4)
+        writer.write(b">a", b"ACGT")
+        writer.write_raw(b"x\n")
+        writer.flush()
+
+        self.assertEqual(f_out.getvalue(), b">a\nACG\nT\nx\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
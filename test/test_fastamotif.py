@@ -0,0 +1,80 @@
+# encoding: utf-8
+"""
+Tests of the IUPAC motif search in fastamotif.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from fastamotif import compile_motif, MotifSearch
+from fastaregion import reverse_complement
+
+# N matches every character
+BASES = {"A": "A", "C": "C", "G": "G", "T": "TU", "U": "TU", "R": "AG", "Y": "CTU", "N": None}
+
+
+def naive(seq, motifs, strand):
+    """Every hit by comparing each position with each motif."""
+    hits = []
+
+    for motif in motifs:
+        targets = []
+
+        if strand in ('both', '+'):
+            targets.append((b"+", motif))
+
+        if strand in ('both', '-'):
+            targets.append((b"-", reverse_complement(motif)))
+
+        for sign, target in targets:
+            for start in range(len(seq) - len(target) + 1):
+                window = seq[start:start + len(target)].upper()
+
+                if all(BASES[chr(m)] is None or chr(b) in BASES[chr(m)] for b, m in zip(window, target)):
+                    match = seq[start:start + len(target)]
+                    hits.append((start, start + len(target), sign, motif,
+                                 reverse_complement(match) if sign == b"-" else match))
+
+    return sorted(hits)
+
+
+def split(rnd, seq):
+    """seq in random chunks with line breaks."""
+    chunks = []
+    pos = 0
+
+    while pos < len(seq):
+        size = rnd.randint(1, 9)
+        chunks.append(seq[pos:pos + size] + b"\n" * rnd.randint(0, 1))
+        pos += size
+
+    return chunks
+
+
+class MotifTest(unittest.TestCase):
+    def test_compile_motif(self):
+        self.assertEqual([m.group(1) for m in compile_motif(b"AYA").finditer(b"ACATAuA")], [b"ACA", b"ATA", b"AuA"])
+        self.assertRaises(ValueError, compile_motif, b"AXA")
+
+    def test_chunks(self):
+        rnd = random.Random(1)
+
+        for _ in range(200):
+            seq = bytes(rnd.choice(b"ACGTacgtN") for _ in range(rnd.randint(0, 60)))
+            motifs = list({bytes(rnd.choice(b"ACGTRYN") for _ in range(rnd.randint(1, 5)))
+                           for _ in range(rnd.randint(1, 3))})
+            strand = rnd.choice(['both', '+', '-'])
+            hits = list(MotifSearch(motifs, strand).search(split(rnd, seq)))
+
+            # Hits are not found twice in the overlap of the chunks
+            self.assertEqual(sorted(hits), naive(seq, motifs, strand), (seq, motifs, strand))
+
+
+if __name__ == "__main__":
+    unittest.main()
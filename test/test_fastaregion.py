@@ -0,0 +1,136 @@
+# encoding: utf-8
+"""
+Tests of the region extraction in fastaregion.
+
+Usage: python3 -m pytest test
+"""
+
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from fastaindex import FastaIndex
+from fastaregion import Region, parse_region, format_region, read_bed, reverse_complement
+from fastaregion import extract_regions, scan_regions
+
+
+class ParseTest(unittest.TestCase):
+    def test_parse_region(self):
+        self.assertEqual(parse_region("chr1:11-20"), Region(b"chr1", 10, 20, b"+"))
+        self.assertEqual(parse_region("chr1:1,001-2,000:-"), Region(b"chr1", 1000, 2000, b"-"))
+        self.assertEqual(parse_region("chr1:5"), Region(b"chr1", 4, None, b"+"))
+        self.assertEqual(parse_region("chr1"), Region(b"chr1", 0, None, b"+"))
+        self.assertEqual(parse_region("EMORG:AF031391"), Region(b"EMORG:AF031391", 0, None, b"+"))
+        self.assertRaises(ValueError, parse_region, "chr1:20-10")
+        self.assertRaises(ValueError, parse_region, "chr1:0-10")
+
+    def test_format_region(self):
+        for text in ["chr1:11-20", "chr1:5-", "chr1", "EMORG:AF031391", "chr1:1-3:-"]:
+            self.assertEqual(format_region(parse_region(text)), text)
+
+    def test_read_bed(self):
+        bed = io.BytesIO(b"track name=x\n#comment\nchr1\t0\t10\nchr2\t5\t8\tname\t0\t-\n\n")
+
+        self.assertEqual(list(read_bed(bed)), [Region(b"chr1", 0, 10, b"+"), Region(b"chr2", 5, 8, b"-")])
+
+    def test_reverse_complement(self):
+        self.assertEqual(reverse_complement(b"ACGTUNacgtRY"), b"RYacgtNAACGT")
+
+
+class ExtractTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.name = os.path.join(self.folder, 'test.fa')
+        rnd = random.Random(1)
+        self.sequences = {}
+
+        with open(self.name, 'wb') as f_out:
+            for i in range(10):
+                name = "seq{}".format(i).encode()
+                seq = bytes(rnd.choice(b"ACGT") for _ in range(rnd.randint(0, 200)))
+                width = rnd.randint(1, 70)
+                lines = [seq[j:j + width] for j in range(0, len(seq), width)]
+
+                # Some records with lines of different length
+                if i % 3 == 2 and len(lines) > 2:
+                    lines[0] += lines.pop(1)
+
+                f_out.write(b">" + name + b" description\n" + b"\n".join(lines) + b"\n")
+                self.sequences[name] = seq
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def expected(self, region):
+        seq = self.sequences[region.name][region.start:region.end]
+
+        return reverse_complement(seq) if region.strand == b"-" else seq
+
+    def test_index_and_scan(self):
+        rnd = random.Random(2)
+        index = FastaIndex.open(self.name, save=False)
+        regions = []
+
+        for name, seq in sorted(self.sequences.items()):
+            for _ in range(20):
+                start = rnd.randint(0, len(seq) + 2)
+                end = rnd.choice([None, start + rnd.randint(0, 50)])
+                regions.append(Region(name, start, end, rnd.choice([b"+", b"-"])))
+
+        regions.append(Region(b"unknown", 0, None, b"+"))
+        # Regions starting behind the end of the record
+        outside = [r for r in regions[:-1] if r.start >= len(self.sequences[r.name]) and (r.start or r.end)]
+        found = [r for r in regions[:-1] if r not in outside]
+        self.assertTrue(outside)
+
+        with open(self.name, 'rb') as f_in:
+            missing = []
+            indexed = list(extract_regions(f_in, index, regions, missing.append))
+            self.assertEqual(missing, outside + [regions[-1]])
+
+            f_in.seek(0)
+            missing = []
+            scanned = list(scan_regions(f_in, regions, missing=missing.append))
+            self.assertEqual(missing, outside + [regions[-1]])
+
+        self.assertEqual([seq for header, seq in indexed], [self.expected(r) for r in found])
+        self.assertEqual(indexed, scanned)
+
+        for header, seq in indexed:
+            start, end = header.split(b":")[1].split(b"/")[0].split(b"-")
+            self.assertLessEqual(int(start), int(end) + 1)
+
+    def test_header(self):
+        index = FastaIndex.open(self.name, save=False)
+        length = len(self.sequences[b"seq1"])
+
+        with open(self.name, 'rb') as f_in:
+            header, seq = next(extract_regions(f_in, index, [parse_region("seq1:2-1000:-")]))
+
+        self.assertEqual(header, ">seq1:2-{}/rc".format(length).encode())
+
+    def test_behind_end(self):
+        index = FastaIndex.open(self.name, save=False)
+        length = len(self.sequences[b"seq1"])
+        regions = [parse_region("seq1:{}-{}".format(length + 1, length + 100)),
+                   parse_region("seq1:{}".format(length))]
+
+        for extract in (lambda f_in, missing: extract_regions(f_in, index, regions, missing),
+                        lambda f_in, missing: scan_regions(f_in, regions, missing=missing)):
+            missing = []
+
+            with open(self.name, 'rb') as f_in:
+                result = list(extract(f_in, missing.append))
+
+            self.assertEqual(missing, regions[:1])
+            self.assertEqual(result, [(">seq1:{0}-{0}".format(length).encode(), self.sequences[b"seq1"][-1:])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# encoding: utf-8
+"""
+Tests of the sequence statistics in fastastats.
+
+Usage: python3 -m pytest test
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import unittest
+
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import fastastats
+
+from fastastats import composition, format_summary, SequenceStats
+
+
+class CompositionTest(unittest.TestCase):
+    def setUp(self):
+        self.numpy = fastastats.numpy
+
+    def tearDown(self):
+        fastastats.numpy = self.numpy
+
+    def test_composition(self):
+        rnd = random.Random(1)
+
+        for length in (0, 1, 100, 5000, 20000):
+            seq = bytes(rnd.choice(b"ACGTN") for _ in range(length))
+            # Symbols which are missing in the first sample
+            seq += b"xyz" * rnd.randint(0, 3)
+
+            self.assertEqual(composition(seq), dict(Counter(seq)))
+
+            fastastats.numpy = None
+            self.assertEqual(composition(seq), dict(Counter(seq)))
+            fastastats.numpy = self.numpy
+
+    def test_format_summary(self):
+        self.assertEqual(format_summary(b"GATTACA"), "7\tA:3|C:1|G:1|T:2\n")
+        self.assertEqual(format_summary(b""), "0\t\n")
+
+
+class SequenceStatsTest(unittest.TestCase):
+    def test_report(self):
+        stats = SequenceStats()
+
+        for seq in (b"ACGTNNNNNN", b"GGGG", b"AT", b""):
+            stats.add(len(seq), composition(seq))
+
+        report = stats.report()
+
+        self.assertEqual(report['sequences'], 4)
+        self.assertEqual(report['total_length'], 16)
+        self.assertEqual((report['min_length'], report['max_length']), (0, 10))
+        self.assertEqual((report['N50'], report['L50']), (10, 1))
+        self.assertEqual(report['GC_percent'], 60.0)
+        self.assertEqual(report['N_count'], 6)
+        self.assertEqual(report['length_histogram'], {"0-0": 1, "1-9": 2, "10-99": 1})
+
+    def test_merge(self):
+        rnd = random.Random(2)
+        seqs = [bytes(rnd.choice(b"ACGTN") for _ in range(rnd.randint(0, 500))) for _ in range(50)]
+        whole = SequenceStats()
+        parts = [SequenceStats() for _ in range(3)]
+
+        for i, seq in enumerate(seqs):
+            whole.add(len(seq), composition(seq))
+            parts[i % 3].add(len(seq), composition(seq))
+
+        merged = SequenceStats()
+
+        for part in parts:
+            merged.merge(part)
+
+        self.assertEqual(merged.report(), whole.report())
+
+    def test_write(self):
+        stats = SequenceStats()
+        stats.add(3, composition(b"ACG"))
+
+        f_out = io.StringIO()
+        stats.write(f_out, 'json')
+        self.assertEqual(json.loads(f_out.getvalue())['composition'], {"A": 1, "C": 1, "G": 1})
+
+        f_out = io.StringIO()
+        stats.write(f_out)
+        self.assertIn("composition.A\t1\n", f_out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+# encoding: utf-8
+"""
+Tests of the line matching, grouping, sorting and parallel search of linegrep.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import linegrep
+
+from linegrep import LineMatcher, read_lines, line_ranges, sort_rows, top_rows
+
+BLAST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.blast')
+
+
+def random_table(rnd, count):
+    return ["q{}\ts{}\t{}\t{:.1e}\n".format(rnd.randrange(20), rnd.randrange(5), rnd.choice(["10", "9", "100", "x"]),
+                                            rnd.random() * 10 ** -rnd.randrange(50)) for _ in range(count)]
+
+
+class LineMatcherTest(unittest.TestCase):
+    def test_prefilter(self):
+        with open(BLAST) as f_in:
+            lines = f_in.readlines() + ["EMORG\n", "AF031391\n"]
+
+        for patterns in ([r"EMORG:(AF03139\d)"], [r"^(\S+)", r"(\d+\.\d+)"], [r"(?i)emorg:(af\S+)"], [r"gi\|(\d+)"]):
+            matcher = LineMatcher(patterns)
+            reference = LineMatcher(patterns)
+            # Without the fixed string test every line is matched with the patterns
+            reference.literals = []
+
+            self.assertEqual([matcher.extract(line) for line in lines], [reference.extract(line) for line in lines])
+
+
+class ReadLinesTest(unittest.TestCase):
+    def test_window(self):
+        lines = ["{}\n".format(i) for i in range(1, 21)]
+
+        for fr in (None, -1, 0, 1, 2, 10, 20, 21, 30):
+            for to in (None, -1, 0, 1, 5, 20, 30):
+                expected = lines[max(fr or 1, 1) - 1:max(to, 0) if to is not None else None]
+                self.assertEqual(list(read_lines(iter(lines), fr, to)), expected, (fr, to))
+
+    def test_line_ranges(self):
+        folder = tempfile.mkdtemp()
+        name = os.path.join(folder, 'table.tsv')
+        rnd = random.Random(1)
+
+        try:
+            for _ in range(50):
+                data = "".join(random_table(rnd, rnd.randint(0, 30))).encode()
+
+                with open(name, 'wb') as f_out:
+                    f_out.write(data)
+
+                ranges = line_ranges(name, rnd.randint(1, 10))
+
+                # Ranges cover the file and start at the beginning of a line
+                self.assertEqual(b"".join(data[start:end] for start, end in ranges), data)
+                self.assertTrue(all(start == 0 or data[start - 1:start] == b"\n" for start, _ in ranges))
+        finally:
+            shutil.rmtree(folder)
+
+
+class SortTest(unittest.TestCase):
+    def args(self, sort=None, top=None, top_by=None):
+        return Namespace(sort=sort, top=top, top_by=top_by, sort_memory=512, temp_dir=None)
+
+    def test_sort_rows(self):
+        rows = [tuple(line.split()) for line in random_table(random.Random(2), 300)]
+        numeric = lambda v: (0, float(v)) if v != "x" else (1, v)
+
+        # Numbers are sorted numerically before strings, -s -3 is descending
+        self.assertEqual(list(sort_rows(rows, self.args([3]))), sorted(rows, key=lambda row: numeric(row[2])))
+        self.assertEqual(list(sort_rows(rows, self.args([-3, 4]))),
+                         sorted(sorted(rows, key=lambda row: float(row[3])), key=lambda row: numeric(row[2]),
+                                reverse=True))
+        self.assertEqual(list(sort_rows([], self.args([1]))), [])
+
+    def test_top_rows(self):
+        rows = [tuple(line.split()) for line in random_table(random.Random(3), 300)]
+        key = lambda row: float(row[3])
+        expected = sorted(rows, key=key)
+
+        self.assertEqual(top_rows(rows, self.args([4], 5)), expected[:5])
+        self.assertEqual(top_rows(rows, self.args(None, 5)), rows[:5])
+
+        # Best hit per query in order of the first occurrence of the query
+        best = {}
+
+        for row in expected:
+            best.setdefault(row[0], []).append(row)
+
+        queries = list(dict.fromkeys(row[0] for row in rows))
+        self.assertEqual(top_rows(rows, self.args([4], 2, 1)), [row for q in queries for row in best[q][:2]])
+        self.assertRaises(linegrep.CLIError, top_rows, rows, self.args([4], 2, 9))
+
+
+class StartTest(unittest.TestCase):
+    """Output of the whole search. Parallel and indexed searches are compared with the serial search."""
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.name = os.path.join(self.folder, 'table.tsv')
+        self.lines = random_table(random.Random(4), 500)
+
+        with open(self.name, 'w') as f_out:
+            f_out.writelines(self.lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def run_linegrep(self, **options):
+        args = Namespace(header=None, pattern=[r"^(\S+)\t(\S+)"], opt_pattern=None, split=None, delimiter="\t",
+                         fr=None, to=None, where=None, where_delimiter=None, group=False, sort=None, top=None,
+                         top_by=None, sort_memory=512, temp_dir=None, jobs=1, index=False, unmatch=None)
+        vars(args).update(options)
+        output = os.path.join(self.folder, 'output.tsv')
+        unmatch = os.path.join(self.folder, 'unmatch.tsv')
+
+        with open(self.name) as args.file, open(output, 'w') as args.output, open(unmatch, 'w') as f_unmatch:
+            if options.get('unmatch'):
+                args.unmatch = [f_unmatch]
+
+            linegrep.start(args)
+
+        with open(output) as f_out, open(unmatch) as f_unmatch:
+            return f_out.read(), f_unmatch.read()
+
+    def test_group(self):
+        output, _ = self.run_linegrep(group=True)
+        counts = {}
+
+        for line in self.lines:
+            row = tuple(line.split("\t")[:2])
+            counts[row] = counts.get(row, 0) + 1
+
+        # Groups in order of their first occurrence
+        self.assertEqual(output, "".join("{}\t{}\t{}\n".format(q, s, n) for (q, s), n in counts.items()))
+
+    def test_from_to(self):
+        for fr, to in [(None, None), (1, 1), (7, 300), (250, None), (None, 42), (499, 600), (300, 200)]:
+            expected = "".join("\t".join(line.split("\t")[:2]) + "\n" for line in self.lines[(fr or 1) - 1:to])
+
+            for options in ({}, {'index': True}, {'index': True, 'jobs': 3}):
+                self.assertEqual(self.run_linegrep(fr=fr, to=to, **options)[0], expected, (fr, to, options))
+
+            os.unlink(self.name + ".lix")
+
+    def test_parallel(self):
+        chunk_size = linegrep.CHUNK_SIZE
+        # Many byte ranges for the small file
+        linegrep.CHUNK_SIZE = 1000
+
+        try:
+            for options in ({}, {'group': True}, {'sort': [-2, 1]}, {'top': 3, 'top_by': 1, 'sort': [2]},
+                            {'where': "c3 > 9", 'unmatch': True}, {'pattern': [r"^(q1)\t"], 'unmatch': True}):
+                serial = self.run_linegrep(**options)
+                self.assertEqual(self.run_linegrep(jobs=3, **options), serial, options)
+                self.assertTrue(serial[0])
+        finally:
+            linegrep.CHUNK_SIZE = chunk_size
+
+
+if __name__ == "__main__":
+    unittest.main()
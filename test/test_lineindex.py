@@ -0,0 +1,121 @@
+# encoding: utf-8
+"""
+Tests of the line offset index in lineindex.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import lineindex
+
+from lineindex import LineIndex
+
+
+def random_lines(rnd):
+    lines = [b"x" * rnd.randint(0, 5) + b"\n" for _ in range(rnd.randint(0, 60))]
+
+    # Last line without newline
+    if rnd.random() < 0.3:
+        lines.append(b"y" * rnd.randint(1, 3))
+
+    return lines
+
+
+class LineIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.block_size = lineindex._BLOCK_SIZE
+        self.folder = tempfile.mkdtemp()
+        self.name = os.path.join(self.folder, 'table.tsv')
+
+    def tearDown(self):
+        lineindex._BLOCK_SIZE = self.block_size
+        shutil.rmtree(self.folder)
+
+    def write(self, lines):
+        with open(self.name, 'wb') as f_out:
+            f_out.write(b"".join(lines))
+
+    def read(self, index, ranges):
+        """Selected lines of the ranges."""
+        selected = []
+
+        with open(self.name, 'rb') as f_in:
+            for start, end, skip, count in ranges:
+                f_in.seek(start)
+                lines = f_in.read(end - start).splitlines(keepends=True)
+                self.assertGreaterEqual(len(lines), skip + count)
+                selected.extend(lines[skip:skip + count])
+
+        return selected
+
+    def test_build(self):
+        rnd = random.Random(1)
+
+        for block_size in (1, 2, 5, 64):
+            lineindex._BLOCK_SIZE = block_size
+
+            for _ in range(30):
+                lines = random_lines(rnd)
+                step = rnd.randint(1, 7)
+                self.write(lines)
+                index = LineIndex.build(self.name, step)
+                starts = [sum(map(len, lines[:i])) for i in range(0, len(lines), step)]
+
+                self.assertEqual(len(index), len(lines))
+                self.assertEqual(index.offsets, starts)
+
+    def test_seek(self):
+        lines = random_lines(random.Random(2)) + [b"end\n"]
+        self.write(lines)
+        index = LineIndex.build(self.name, 4)
+
+        with open(self.name, 'rb') as f_in:
+            for line in range(1, len(lines) + 1):
+                offset, skip = index.seek(line)
+                f_in.seek(offset)
+
+                for _ in range(skip):
+                    f_in.readline()
+
+                self.assertEqual(f_in.readline(), lines[line - 1])
+
+    def test_ranges(self):
+        rnd = random.Random(3)
+
+        for _ in range(100):
+            lines = random_lines(rnd)
+            self.write(lines)
+            index = LineIndex.build(self.name, rnd.randint(1, 7))
+            fr = rnd.choice([None, rnd.randint(0, len(lines) + 2)])
+            to = rnd.choice([None, rnd.randint(0, len(lines) + 2)])
+            ranges = index.ranges(rnd.randint(1, 5), fr, to)
+
+            self.assertEqual(self.read(index, ranges), lines[max(fr or 1, 1) - 1:to])
+
+    def test_round_trip(self):
+        self.write(random_lines(random.Random(4)) + [b"end\n"])
+        index = LineIndex.open(self.name)
+        loaded = LineIndex.load(self.name)
+
+        self.assertTrue(os.path.exists(LineIndex.sidecar(self.name)))
+        self.assertEqual((loaded.offsets, loaded.lines, loaded.step), (index.offsets, index.lines, index.step))
+
+        # Outdated after a change of the file
+        with open(self.name, 'ab') as f_out:
+            f_out.write(b"more\n")
+
+        self.assertIsNone(LineIndex.load(self.name))
+        self.assertIsNone(LineIndex.open(self.name, build=False))
+        self.assertEqual(len(LineIndex.open(self.name)), index.lines + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# encoding: utf-8
+"""
+Tests of the table joins in mergegrep.
+
+Usage: python3 -m pytest test
+"""
+
+import io
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from mergegrep import JOIN_TYPES, read_table, row_writer, hash_join, regex_join, sort_merge_join
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+
+
+def random_tables(rnd):
+    """Table 1 with the key in column 1 and the exact pattern of the key in column 2 and table 2 with
+    the key in column 2. Some rows have no key column."""
+    keys = ["K{}".format(i) for i in range(rnd.randint(1, 10))] + ["a.b", "a+b", "(x)"]
+    rows1 = []
+    rows2 = []
+
+    for i in range(rnd.randint(0, 40)):
+        key = rnd.choice(keys)
+        rows1.append([key, "^" + re.escape(key) + "$", str(i)])
+
+    for i in range(rnd.randint(0, 40)):
+        rows2.append([str(i), rnd.choice(keys), "x" * rnd.randint(0, 2)] if rnd.random() < 0.9 else [str(i)])
+
+    return rows1, rows2
+
+
+class JoinTest(unittest.TestCase):
+    def test_join_modes(self):
+        rnd = random.Random(1)
+
+        for _ in range(200):
+            rows1, rows2 = random_tables(rnd)
+
+            for join in JOIN_TYPES:
+                hashed = list(hash_join(rows1, rows2, 1, 2, join))
+                regex = list(regex_join(rows1, rows2, 2, 2, join))
+                merged = list(sort_merge_join(rows1, rows2, 1, 2, join))
+
+                # Table 1 order and key order with stable ties
+                self.assertEqual(regex, hashed, join)
+                self.assertEqual(merged, sorted(hashed, key=lambda row: row[0]), join)
+
+    def test_spill(self):
+        rnd = random.Random(2)
+        rows1 = [["K{}".format(rnd.randrange(500)), str(i)] for i in range(3000)]
+        rows2 = [["K{}".format(rnd.randrange(500)), str(i)] for i in range(3000)]
+
+        for join in JOIN_TYPES:
+            hashed = list(hash_join(rows1, rows2, 1, 1, join))
+            merged = list(sort_merge_join(rows1, rows2, 1, 1, join, max_memory=64 * 1024))
+
+            self.assertEqual(merged, sorted(hashed, key=lambda row: row[0]), join)
+
+    def test_left(self):
+        rows1 = [["A", "1"], ["B", "2"], ["C"]]
+        rows2 = [["A", "x", "y"], ["A", "z"]]
+
+        for join in (hash_join, sort_merge_join):
+            self.assertEqual(list(join(rows1, rows2, 1, 1, 'left')),
+                             [["A", "1", "A", "x", "y"], ["A", "1", "A", "z"], ["B", "2", "", "", ""],
+                              ["C", "", "", ""]])
+
+    def test_regex(self):
+        rows1 = [["A"], ["^D"], ["X"]]
+        rows2 = [["A,C"], ["D,A,E"], ["E"]]
+
+        self.assertEqual(list(regex_join(rows1, rows2, 1, 1)),
+                         [["A", "A,C"], ["A", "D,A,E"], ["^D", "D,A,E"]])
+        self.assertEqual(list(regex_join(rows1, rows2, 1, 1, 'anti')), [["X"]])
+
+
+class TableTest(unittest.TestCase):
+    def test_read_table(self):
+        with open(os.path.join(TEST, 'table1.csv')) as f_in:
+            rows = list(read_table(f_in, ",", '"'))
+
+        self.assertEqual(rows[0], ["A", "1", "test", "1,2"])
+        self.assertEqual(rows[3], ["D", "4", "eins,drei", "6"])
+
+        # Without csv quoting
+        self.assertEqual(list(read_table(io.StringIO("a;'b'\n\n"), ";", "'")), [["a", "b"]])
+        self.assertEqual(list(read_table(io.StringIO("a||b\n"), "||", "")), [["a", "b"]])
+
+    def test_row_writer(self):
+        f_out = io.StringIO()
+        write = row_writer(f_out, ",")
+        write(["a", "b,c"])
+        row_writer(f_out, ",", '"')(["a", "b"])
+        row_writer(f_out, "||")(["a", "b"])
+
+        self.assertEqual(f_out.getvalue(), 'a,"b,c"\n"a","b"\na||b\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
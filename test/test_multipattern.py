@@ -0,0 +1,105 @@
+# encoding: utf-8
+"""
+Tests of the fixed string extraction and the multi pattern matchers in multipattern.
+
+Usage: python3 -m pytest test
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from linegrep import LineMatcher
+from multipattern import MultiPattern, PatternSet, required_literal
+
+# Patterns with escapes which are longer than two characters
+ESCAPES = [r"\x41(\d+)", r"\0101(\d+)", r"\101(\d+)", r"A(\d+)", r"\U00000041(\d+)",
+           r"\N{LATIN CAPITAL LETTER A}(\d+)", r"(A)\1(\d+)", r"\x41BC", r"EMORG:(\S+)"]
+
+
+class RequiredLiteralTest(unittest.TestCase):
+    def test_examples(self):
+        self.assertEqual(required_literal(r"EMORG:(AF0313\S+)\s+(\S+)"), "EMORG:AF0313")
+        self.assertEqual(required_literal(r"(a|b)cd"), "cd")
+        self.assertEqual(required_literal(r"a|b"), "")
+        self.assertEqual(required_literal(rb"gi\|(\d+)"), b"gi|")
+
+    def test_numeric_escapes(self):
+        self.assertEqual(required_literal(r"\x41(\d+)"), "")
+        self.assertEqual(required_literal(r"\0101(\d+)"), "1")
+        self.assertEqual(required_literal(r"\x41BC"), "BC")
+        self.assertEqual(required_literal(r"\N{LATIN CAPITAL LETTER A}bc"), "bc")
+
+    def test_literal_in_every_match(self):
+        rnd = random.Random(1)
+        tokens = ["a", "b", "A", "1", r"\x41", r"\0101", r"\101", r"A", r"\N{LATIN CAPITAL LETTER A}",
+                  r"\d", r"\.", "(ab)", r"(\x41)", "[ab]", "a*", "b+", "c?", "."]
+        parts = ["a", "b", "A", "1", ".", "\x08", "\x081", "ab", "A1"]
+
+        for _ in range(2000):
+            pattern = "".join(rnd.choice(tokens) for _ in range(rnd.randint(1, 5)))
+            compiled = re.compile(pattern)
+            literal = required_literal(pattern)
+
+            for _ in range(20):
+                subject = "".join(rnd.choice(parts) for _ in range(rnd.randint(0, 8)))
+                match = compiled.search(subject)
+
+                if match:
+                    self.assertIn(literal, match.group(0), pattern)
+
+
+class PatternSetTest(unittest.TestCase):
+    def naive(self, patterns, subject):
+        return [i for i, p in enumerate(patterns) if re.search(p, subject)]
+
+    def test_escaped_keys(self):
+        patterns = ESCAPES + ["ABC", "", "B", r"^AB", r"C$", r"(?i)abc"]
+        patterns_set = PatternSet(patterns)
+
+        for subject in ["ABC", "A12", "xAB", "\x08123", "abc", "", "BC", "AA1"]:
+            self.assertEqual(patterns_set.matches(subject), self.naive(patterns, subject), subject)
+
+    def test_random_patterns(self):
+        rnd = random.Random(2)
+        tokens = ["a", "b", "c", "ab", "(ab)", "[ab]", "a*", "b+", "c?", "(a|b)", r"\d", ".", r"\x61", r"\0142"]
+
+        for _ in range(200):
+            patterns = ["".join(rnd.choice(tokens) for _ in range(rnd.randint(0, 4)))
+                        for _ in range(rnd.randint(1, 20))]
+            patterns_set = PatternSet(patterns)
+            multi = MultiPattern(patterns)
+
+            for _ in range(20):
+                subject = "".join(rnd.choice("abcx1") for _ in range(rnd.randint(0, 12)))
+                expected = self.naive(patterns, subject)
+                self.assertEqual(patterns_set.matches(subject), expected, (patterns, subject))
+                self.assertEqual(multi.search(subject), bool(expected), (patterns, subject))
+
+
+class LineMatcherTest(unittest.TestCase):
+    def test_prefilter_keeps_matches(self):
+        lines = ["A123\tfoo\n", "AB1C\n", "\x08123\n", "EMORG:x y\n", "BC\n", "no match\n"]
+
+        for pattern in ESCAPES:
+            matcher = LineMatcher([pattern])
+            compiled = re.compile(pattern)
+
+            for line in lines:
+                match = compiled.search(line)
+                expected = [match.groups()] if match and match.groups() else None
+                self.assertEqual(matcher.extract(line), expected, pattern)
+
+    def test_optional_and_split(self):
+        matcher = LineMatcher([r"^(\S+)"], [r"(x\d)"], [r"\s(\d+ \d+)$", r" "])
+
+        self.assertEqual(matcher.extract("q1 x2 10 20\n"), [("q1", "x2", "10"), ("q1", "x2", "20")])
+        self.assertEqual(matcher.extract("q1 10\n"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# encoding: utf-8
+"""
+Tests of the bounded pool map in poolmap.
+
+Usage: python3 -m pytest test
+"""
+
+import multiprocessing
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from poolmap import bounded_imap
+
+
+def square(x):
+    if x < 0:
+        raise ValueError("negative {}".format(x))
+
+    return x * x
+
+
+class BoundedImapTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = multiprocessing.Pool(3)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def test_order(self):
+        self.assertEqual(list(bounded_imap(self.pool, square, range(50), 4)), [x * x for x in range(50)])
+        self.assertEqual(sorted(bounded_imap(self.pool, square, range(50), 4, ordered=False)),
+                         [x * x for x in range(50)])
+        self.assertEqual(list(bounded_imap(self.pool, square, [], 4)), [])
+
+    def test_window(self):
+        taken = []
+
+        def tasks():
+            for x in range(100):
+                taken.append(x)
+                yield x
+
+        for ordered in (True, False):
+            del taken[:]
+            results = bounded_imap(self.pool, square, tasks(), 4, ordered=ordered)
+            next(results)
+
+            # Only the window and one refill are submitted before the consumer asks for more
+            self.assertEqual(len(taken), 5)
+            results.close()
+
+    def test_error(self):
+        for ordered in (True, False):
+            with self.assertRaises(ValueError):
+                list(bounded_imap(self.pool, square, [1, 2, -1, 3], 2, ordered=ordered))
+
+
+if __name__ == "__main__":
+    unittest.main()
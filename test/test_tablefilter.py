@@ -0,0 +1,75 @@
+# encoding: utf-8
+"""
+Tests of the --where column filters in tablefilter.
+
+Usage: python3 -m pytest test
+"""
+
+import io
+import os
+import pickle
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import tablefilter
+
+from tablefilter import WhereFilter
+
+BLAST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.blast')
+
+EXPRESSIONS = ["c1 > 1", "c1 == 'abc'", "c1 / c2 > 1", "c1 % c2 == 0", "not c1 < c2", "c1 < c2 < c3",
+               "c1 + c2 == 3", "c1 ** c2 > 2", "-c1 > 0 or c2 == 'x'", "c1 != c2 and c3", "c3", "not c1 / c2 < 1"]
+VALUES = ["0", "1", "2.5", "-3", "1e3", "abc", "x", "nan", "inf", ""]
+
+
+def row_filter(expression, delimiter=None):
+    where = WhereFilter(expression, delimiter)
+    where._vector_code = None
+
+    return where
+
+
+class WhereFilterTest(unittest.TestCase):
+    def test_blast(self):
+        with open(BLAST) as f_in:
+            lines = f_in.readlines()
+
+        where = WhereFilter("pident > 85 and evalue < 1e-50")
+        unmatch = io.StringIO()
+        expected = [line for line in lines
+                    if float(line.split()[2]) > 85 and float(line.split()[10]) < 1e-50]
+
+        self.assertEqual(list(where.filter(lines, unmatch)), expected)
+        self.assertEqual(len(unmatch.getvalue().splitlines()), len(lines) - len(expected))
+        self.assertEqual(list(WhereFilter("sseqid == 'EMORG:AF031387'").filter(lines)),
+                         [line for line in lines if line.split()[1] == "EMORG:AF031387"])
+
+    @unittest.skipIf(tablefilter.numpy is None, "NumPy is not installed")
+    def test_vector_and_rows(self):
+        rnd = random.Random(1)
+
+        for _ in range(2000):
+            expression = rnd.choice(EXPRESSIONS)
+            # Short lines, mixed columns, division by zero and overflow
+            lines = ["\t".join(rnd.choice(VALUES) for _ in range(rnd.randint(2, 3))) + "\n"
+                     for _ in range(rnd.randint(1, 8))]
+
+            self.assertEqual(WhereFilter(expression, "\t").mask(lines), row_filter(expression, "\t").mask(lines),
+                             (expression, lines))
+
+    def test_invalid(self):
+        for expression in ["c1 >", "__import__('os')", "c1.real > 0", "foo > 1", "c0 > 1", "c1 in 'abc'",
+                           "None == c1", "[c1] == 1"]:
+            self.assertRaises(ValueError, WhereFilter, expression)
+
+    def test_pickle(self):
+        where = pickle.loads(pickle.dumps(WhereFilter("c2 >= 2", ",")))
+
+        self.assertEqual(where.mask(["a,1\n", "b,2\n", "c\n"]), [False, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()